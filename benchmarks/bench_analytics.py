@@ -0,0 +1,41 @@
+"""Benchmark of the library-wide analytics.
+
+Fills a temporary database with synthetic libraries of different sizes
+and reports the time of every Analytics statistic.
+
+Usage:
+    python -m benchmarks.bench_analytics
+"""
+from time import perf_counter
+
+from yandex_music.analytics import Analytics
+
+from .bench_loader import fill, temporary_db
+
+SIZES = (10000, 100000)
+STATISTICS = (
+    "get_duration_percentiles",
+    "get_genres_by_decade",
+    "get_summary",
+    "get_top_artists",
+    "get_years_histogram",
+)
+
+
+def main():
+    print(f"{'tracks':>8} {'statistic':<26} {'time':>9}")
+
+    for size in SIZES:
+        with temporary_db():
+            fill("benchmark", size)
+            analytics = Analytics("benchmark")
+
+            for name in STATISTICS:
+                start = perf_counter()
+                getattr(analytics, name)()
+                elapsed = perf_counter() - start
+                print(f"{size:>8} {name:<26} {elapsed:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
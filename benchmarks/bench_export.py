@@ -0,0 +1,51 @@
+"""Benchmark of the streaming export.
+
+Fills a temporary database with synthetic libraries of different sizes
+and reports the time and the peak of the memory traced by tracemalloc
+of a user's export to every format. The peak should stay the same
+while the library grows.
+
+Usage:
+    python -m benchmarks.bench_export
+"""
+import os
+import tracemalloc
+from time import perf_counter
+
+from yandex_music.export import FORMATS, Export, pyarrow
+
+from .bench_loader import fill, temporary_db
+
+SIZES = (10000, 100000)
+
+
+def main():
+    print(f"{'tracks':>8} {'format':<8} {'time':>9} {'peak memory':>12}")
+
+    for size in SIZES:
+        with temporary_db() as path:
+            fill("benchmark", size)
+            export = Export("benchmark")
+
+            for fmt in FORMATS:
+                if fmt == "parquet" and not pyarrow:
+                    continue
+
+                directory = os.path.join(path, fmt)
+                os.mkdir(directory)
+
+                tracemalloc.start()
+                start = perf_counter()
+                export.export(directory, fmt)
+                elapsed = perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                print(
+                    f"{size:>8} {fmt:<8} {elapsed:>8.3f}s"
+                    f" {peak / 2 ** 20:>9.1f} MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
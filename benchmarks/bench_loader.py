@@ -0,0 +1,103 @@
+"""Benchmark of the models graph loading from the database.
+
+Fills a temporary database with synthetic libraries of different sizes
+and reports the number of SQL statements and the time of Loader.load().
+
+Usage:
+    python -m benchmarks.bench_loader
+"""
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from time import perf_counter
+
+from yandex_music.database import DataCtx
+from yandex_music.loader import Loader
+from yandex_music.query import Query, UserQuery
+
+SIZES = (1000, 5000, 20000)
+PLAYLISTS = 10
+GENRES = ("rock", "pop", "jazz", "classical", None)
+
+
+@contextmanager
+def temporary_db():
+    """Run the code with an empty database in a temporary directory."""
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        os.makedirs("yandex_music/cache")
+        try:
+            yield path
+        finally:
+            os.chdir(cwd)
+
+
+def fill(login: str, tracks_count: int, seed: int = 0):
+    """Save a synthetic library of a user to the database."""
+    rnd = random.Random(seed)
+    query = Query(login)
+    query.insert_user(1, login, "Benchmark", PLAYLISTS)
+
+    tracks = [
+        (i, f"Track {i}", rnd.randint(1960, 2020), rnd.choice(GENRES),
+         rnd.randint(60000, 400000))
+        for i in range(1, tracks_count + 1)
+    ]
+    artists = [(i, f"Artist {i}") for i in range(1, tracks_count // 5 + 2)]
+    artist_track = {
+        (rnd.choice(artists)[0], i[0])
+        for i in tracks for _ in range(rnd.randint(1, 3))
+    }
+
+    query.insert_tracks(tracks)
+    query.insert_artists(artists)
+    query.insert_artist_track(list(artist_track))
+
+    query.insert_playlists(
+        [(i, f"Playlist {i}", 0, 0, None, None) for i in range(PLAYLISTS)]
+    )
+    query.insert_playlist_tracks(
+        [(0, i[0]) for i in tracks]
+        + [
+            (i, j[0])
+            for i in range(1, PLAYLISTS)
+            for j in rnd.sample(tracks, tracks_count // PLAYLISTS)
+        ]
+    )
+    for i in range(PLAYLISTS):
+        query.update_tracks_count(i)
+        query.update_playlist_duration(i)
+
+
+def measure(login: str):
+    """Load the user's graph and count the executed statements."""
+    statements = []
+    db = DataCtx()
+    query = Query(login, db)
+    user_query = UserQuery(login, db)
+    db._conn.set_trace_callback(statements.append)
+
+    start = perf_counter()
+    user = Loader(query, user_query).load(login)
+    elapsed = perf_counter() - start
+
+    return user, len(statements), elapsed
+
+
+def main():
+    print(f"{'tracks':>8} {'memberships':>12} {'statements':>11} {'time':>9}")
+
+    for size in SIZES:
+        with temporary_db():
+            fill("benchmark", size)
+            user, statements, elapsed = measure("benchmark")
+
+        memberships = sum(len(i.tracks) for i in user.playlists)
+        print(f"{size:>8} {memberships:>12} {statements:>11} {elapsed:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
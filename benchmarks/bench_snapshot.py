@@ -0,0 +1,43 @@
+"""Benchmark of the clients' warm start with the snapshots.
+
+Fills a temporary database with synthetic libraries of different sizes
+and reports the time of a saved user's Client creation without the
+snapshot, with the snapshot's saving and with the valid snapshot.
+
+Usage:
+    python -m benchmarks.bench_snapshot
+"""
+from time import perf_counter
+
+from yandex_music.client import Client
+from yandex_music.database import DataCtx
+from yandex_music.log import set_verbose
+
+from .bench_loader import fill, temporary_db
+
+SIZES = (1000, 5000, 20000)
+SCENARIOS = (
+    ("no snapshot", False),
+    ("snapshot saving", True),
+    ("warm start", True),
+)
+
+
+def main():
+    set_verbose(False)
+    print(f"{'tracks':>8} {'scenario':<16} {'time':>9}")
+
+    for size in SIZES:
+        with temporary_db():
+            fill("benchmark", size)
+            db = DataCtx()
+
+            for name, snapshot in SCENARIOS:
+                start = perf_counter()
+                Client("benchmark", db=db, snapshot=snapshot)
+                elapsed = perf_counter() - start
+                print(f"{size:>8} {name:<16} {elapsed:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark of the sync and the models loading against a local server.
+
+Scenarios:
+    cold download: a new user's data is downloaded and saved
+    no-op update: nothing has changed since the download
+    incremental update: a playlist is changed, one is deleted and one
+      is added
+    model load: the saved user is loaded by a new Client
+
+Every scenario reports the wall time, the number of HTTP requests and
+SQL statements and the peak of the memory traced by tracemalloc. The
+times include the tracing overhead, and the fake server runs in the
+same process.
+
+Usage:
+    python -m benchmarks.bench_sync [--playlists N] [--tracks N]
+        [--fanout N] [--overlap F] [--seed N]
+"""
+import argparse
+import tracemalloc
+from time import perf_counter
+
+from yandex_music.cache import ResponseCache
+from yandex_music.client import Client
+from yandex_music.database import DataCtx
+from yandex_music.log import set_verbose
+from yandex_music.network import Connection
+
+from .bench_loader import temporary_db
+from .fake_server import FakeServer
+from .synthetic import change_library, make_library
+
+LOGIN = "benchmark"
+
+
+def measure(func, server: FakeServer, statements: list) -> tuple:
+    """Run a scenario and measure it.
+
+    :param func: a function running the scenario
+    :param server: FakeServer object answering the requests
+    :param statements: a one item list with the SQL statements counter
+    :return: a tuple with the time, the requests and statements counts
+      and the memory peak
+    """
+    requests = server.requests
+    statements[0] = 0
+
+    tracemalloc.start()
+    start = perf_counter()
+    func()
+    elapsed = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, server.requests - requests, statements[0], peak
+
+
+def run(library: dict) -> list:
+    """Run all the scenarios for a library.
+
+    :return: a list of (scenario, measures) tuples
+    """
+    statements = [0]
+    results = []
+
+    def trace(statement):
+        # The triggers' statements are parts of the traced ones.
+        if not statement.startswith("--"):
+            statements[0] += 1
+
+    with temporary_db(), FakeServer({LOGIN: library}) as server:
+        connection = Connection(cache=ResponseCache(), base_url=server.url)
+        db = DataCtx()
+        db._conn.set_trace_callback(trace)
+        clients = []
+
+        def download():
+            clients.append(Client(LOGIN, connection, db=db))
+
+        results.append(
+            ("cold download", measure(download, server, statements))
+        )
+        results.append(
+            (
+                "no-op update",
+                measure(clients[0].update, server, statements),
+            )
+        )
+
+        change_library(library)
+        results.append(
+            (
+                "incremental update",
+                measure(clients[0].update, server, statements),
+            )
+        )
+        results.append(
+            (
+                "model load",
+                measure(
+                    lambda: Client(LOGIN, connection, db=db),
+                    server,
+                    statements
+                ),
+            )
+        )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--playlists", type=int, default=10)
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    set_verbose(False)
+
+    library = make_library(
+        playlists=args.playlists,
+        tracks=args.tracks,
+        fanout=args.fanout,
+        overlap=args.overlap,
+        seed=args.seed,
+    )
+
+    print(
+        f"{'scenario':<20} {'time':>9} {'requests':>9} {'statements':>11}"
+        f" {'peak memory':>12}"
+    )
+    for name, (elapsed, requests, statements, peak) in run(library):
+        print(
+            f"{name:<20} {elapsed:>8.3f}s {requests:>9} {statements:>11}"
+            f" {peak / 2 ** 20:>9.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""A local stand-in for the Yandex Music handlers.
+
+Serves the `library.jsx`, `playlist.jsx` and `artist.jsx` responses of
+network.URLS for the synthetic libraries, so a Client can be run with
+Connection(base_url=server.url) without the real site.
+"""
+import json
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeServer:
+    """An HTTP server answering in a background thread.
+
+    The responses have ETags, so the conditional requests of a cached
+    Connection are answered with "304 Not Modified" when nothing has
+    changed.
+
+    Args:
+        libraries: a dict with {login: library} items, see synthetic.py
+
+    Attributes:
+        url: the base URL of the handlers
+        requests: the number of the received requests
+    """
+
+    def __init__(self, libraries: dict):
+        self.libraries = libraries
+        self.requests = 0
+
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self.url = f"http://127.0.0.1:{self._server.server_port}/handlers"
+
+    def get_response(self, path: str):
+        """Get a response's body for a request's path.
+
+        :param path: the request's path with the query
+        :return: the response's JSON or None if the path is unknown
+        """
+        with self._lock:
+            self.requests += 1
+
+        url = urlparse(path)
+        query = {i: j[0] for i, j in parse_qs(url.query).items()}
+        handler = url.path.rsplit("/", 1)[-1]
+
+        if handler == "artist.jsx":
+            return self._get_artist(int(query["artist"]))
+
+        library = self.libraries.get(query.get("owner"))
+        if handler == "library.jsx":
+            if "filter" in query:
+                return self._get_playlists(library)
+            return self._get_info(library)
+
+        if handler == "playlist.jsx":
+            kinds = [int(i) for i in query["kinds"].split(",")]
+            return self._get_playlist(library, kinds)
+
+    def _get_artist(self, artist_id):
+        for library in self.libraries.values():
+            artist = library["artists"].get(artist_id)
+            if artist:
+                return {
+                    "artist": {
+                        "id": artist["id"],
+                        "name": artist["name"],
+                        "likesCount": artist["likes"],
+                    }
+                }
+
+        return {}
+
+    @staticmethod
+    def _get_info(library):
+        if not library:
+            return {}
+
+        return {"visibility": "public", "hasTracks": True}
+
+    @staticmethod
+    def _get_playlist(library, kinds):
+        playlists = [
+            {
+                **_get_short_info(library["playlists"][i]),
+                "trackIds": library["playlists"][i]["trackIds"],
+                "tracks": [
+                    library["tracks"][int(j.split(":")[0])]
+                    for j in library["playlists"][i]["trackIds"]
+                ],
+            }
+            for i in kinds if i in library["playlists"]
+        ]
+
+        if len(kinds) == 1:
+            return {"playlist": playlists[0]} if playlists else {}
+
+        return {"playlists": playlists}
+
+    @staticmethod
+    def _get_playlists(library):
+        return {
+            "owner": library["owner"],
+            "playlistIds": list(library["playlists"]),
+            "playlists": [
+                _get_short_info(i) for i in library["playlists"].values()
+            ],
+        }
+
+    def __enter__(self):
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        js = self.server.fake.get_response(self.path)
+        if js is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = json.dumps(js).encode()
+        etag = f'"{sha1(body).hexdigest()}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _get_short_info(playlist):
+    """Get a playlist's info of the playlists' list."""
+    return {
+        "kind": playlist["kind"],
+        "title": playlist["title"],
+        "trackCount": len(playlist["trackIds"]),
+        "revision": playlist["revision"],
+        "modified": playlist["modified"],
+    }
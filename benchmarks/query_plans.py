@@ -0,0 +1,106 @@
+"""Check that the hot queries are executed by indexes.
+
+Runs the hot queries on a small synthetic library, prints the query plan
+of every executed statement and exits with an error if a statement scans
+the whole of a big table.
+
+Usage:
+    python -m benchmarks.query_plans
+"""
+import re
+import sys
+
+from yandex_music.database import DataCtx
+from yandex_music.export import ENTITIES, Export
+from yandex_music.query import Query, UserQuery
+
+from .bench_loader import fill, temporary_db
+
+BIG_TABLES = ("artist_track", "playlist_track", "track")
+# Deleting the unused rows has to check every row of the table.
+FULL_SCANS = ("delete from artist where", "delete from track where")
+
+
+def run_hot_queries(query, user_query, export):
+    query.get_artist_genres(1)
+    query.get_artist_tracks(1)
+    query.get_playlist_tracks(1)
+    query.get_track_artists(1)
+    query.get_user_artist_track()
+    query.get_user_artists()
+    query.get_user_artists_genres()
+    query.get_user_playlist_track()
+    query.get_user_tracks()
+    query.search_artists("artist", 20)
+    query.search_tracks("track 1", None, 20)
+    query.search_tracks("track 1", 1, 20)
+    query.update_playlist_duration(1)
+    query.update_tracks_count(1)
+    query.delete_tracks(1, {1, 2})
+    query.delete_unused()
+
+    user_query.get_artists_counter(1)
+    user_query.get_genre_artists("rock")
+    user_query.get_genres_counter(1)
+    user_query.get_user_artists_counter()
+    user_query.get_user_genres_counter()
+
+    for entity in ENTITIES:
+        list(export.iter_rows(entity))
+
+
+def get_full_scans(plan):
+    """Get the big tables scanned without an index."""
+    scans = []
+    for line in plan:
+        match = re.match(r"SCAN (\w+)", line)
+        if match and match[1] in BIG_TABLES and "INDEX" not in line:
+            scans.append(match[1])
+
+    return scans
+
+
+def main():
+    statements = []
+    failed = False
+
+    with temporary_db():
+        fill("benchmark", 300)
+
+        db = DataCtx()
+        query = Query("benchmark", db)
+        user_query = UserQuery("benchmark", db)
+        export = Export("benchmark", db)
+
+        db._conn.set_trace_callback(statements.append)
+        run_hot_queries(query, user_query, export)
+        db._conn.set_trace_callback(None)
+
+        for statement in statements:
+            statement = " ".join(statement.split())
+            # The triggers' and the full-text index's inner statements
+            # are traced too.
+            if statement.upper() in ("BEGIN", "COMMIT") \
+                    or statement.startswith(("--", "PRAGMA")):
+                continue
+
+            plan = [
+                i[3] for i in query._db.select_all(
+                    f"explain query plan {statement}"
+                )
+            ]
+            scans = get_full_scans(plan)
+            if statement.lower().startswith(FULL_SCANS):
+                scans = [i for i in scans if i != "track"]
+
+            print(("FULL SCAN " if scans else "OK ") + statement[:70])
+            for line in plan:
+                print(f"    {line}")
+
+            failed = failed or bool(scans)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Synthetic users' libraries in the shapes of the Yandex Music responses.
+
+A library is a dict with the "owner", "playlists", "tracks" and
+"artists" items. The playlists are keyed by kind and keep the tracks
+ids in the "trackIds" lists, the tracks and the artists are keyed by id.
+The "fanout" and "random" items are used to add new tracks.
+"""
+import random
+
+GENRES = ("rock", "pop", "jazz", "classical", "electronics", None)
+MODIFIED = "2020-01-01T00:00:00+00:00"
+
+
+def make_library(uid: int = 1, playlists: int = 10, tracks: int = 1000,
+                 fanout: int = 3, overlap: float = 0.2,
+                 seed: int = 0) -> dict:
+    """Generate a user's library.
+
+    Every playlist has `tracks // playlists` tracks. The `overlap` part
+    of them is taken from a pool shared by all the playlists, the rest
+    are the playlist's own tracks.
+
+    :param uid: the owner's id
+    :param playlists: the number of playlists
+    :param tracks: the total number of the playlists' tracks
+    :param fanout: the maximum number of a track's artists
+    :param overlap: the part of the shared tracks in a playlist, 0..1
+    :param seed: a seed of the random generator
+    :return: a library dict
+    """
+    rnd = random.Random(seed)
+    size = max(tracks // playlists, 1)
+    shared = round(size * overlap)
+
+    library = {
+        "owner": {"uid": uid, "name": f"User {uid}"},
+        "playlists": {},
+        "tracks": {},
+        "artists": {
+            i: {
+                "id": i,
+                "name": f"Artist {i}",
+                "likes": rnd.randint(0, 10 ** 6),
+            }
+            for i in range(1, max(tracks // 10, fanout) + 1)
+        },
+        "fanout": fanout,
+        "random": rnd,
+    }
+
+    pool = [add_track(library) for _ in range(size if shared else 0)]
+    for kind in range(playlists):
+        ids = rnd.sample(pool, shared) + [
+            add_track(library) for _ in range(size - shared)
+        ]
+        add_playlist(library, kind, ids)
+
+    return library
+
+
+def add_playlist(library: dict, kind: int, ids: list):
+    """Add a playlist with the tracks to the library."""
+    library["playlists"][kind] = {
+        "kind": kind,
+        "title": f"Playlist {kind}",
+        "revision": 1,
+        "modified": MODIFIED,
+        "trackIds": [f"{i}:{i * 10}" for i in ids],
+    }
+
+
+def add_track(library: dict) -> int:
+    """Add a new track to the library.
+
+    :return: the track's id
+    """
+    rnd = library["random"]
+    track_id = len(library["tracks"]) + 1
+    artists = [
+        library["artists"][i]
+        for i in rnd.sample(
+            range(1, len(library["artists"]) + 1),
+            rnd.randint(1, library["fanout"])
+        )
+    ]
+
+    library["tracks"][track_id] = {
+        "id": str(track_id),
+        "title": f"Track {track_id}",
+        "durationMs": rnd.randint(60000, 400000),
+        "albums": [
+            {"year": rnd.randint(1960, 2020), "genre": rnd.choice(GENRES)}
+        ],
+        "artists": [{"id": i["id"], "name": i["name"]} for i in artists],
+    }
+
+    return track_id
+
+
+def change_library(library: dict, part: float = 0.1):
+    """Change the library like a user does between two syncs.
+
+    A part of the first playlist's tracks is replaced with new ones, the
+    last playlist is deleted and a new playlist is added.
+
+    :param library: a library dict
+    :param part: the part of the first playlist's tracks to replace
+    """
+    playlists = library["playlists"]
+    first = playlists[min(playlists)]
+    count = max(round(len(first["trackIds"]) * part), 1)
+
+    first["trackIds"] = first["trackIds"][count:] + [
+        f"{i}:{i * 10}" for i in (add_track(library) for _ in range(count))
+    ]
+    first["revision"] += 1
+    first["modified"] = "2021-01-01T00:00:00+00:00"
+
+    del playlists[max(playlists)]
+    add_playlist(
+        library,
+        max(playlists) + 1,
+        [add_track(library) for _ in range(count)]
+    )
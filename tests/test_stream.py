@@ -0,0 +1,77 @@
+import json
+import unittest
+
+from yandex_music.stream import iter_array
+
+
+def split(document: str, size: int) -> list:
+    """Split a document's bytes into chunks of the size."""
+    data = document.encode()
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterArrayTest(unittest.TestCase):
+    def assert_items(self, document, key, expected):
+        for size in range(1, len(document.encode()) + 1):
+            with self.subTest(size=size):
+                self.assertEqual(
+                    list(iter_array(split(document, size), key)), expected
+                )
+
+    def assert_error(self, document, key):
+        for size in range(1, len(document.encode()) + 1):
+            with self.subTest(size=size):
+                with self.assertRaises(ValueError):
+                    list(iter_array(split(document, size), key))
+
+    def test_items(self):
+        document = json.dumps(
+            {
+                "playlist": {
+                    "title": "tracks",
+                    "tracks": [
+                        {"id": "1", "title": 'Мне нравится "1" ]'},
+                        {"id": "2", "albums": [{"year": 2000}]},
+                    ],
+                    "trackCount": 2,
+                }
+            },
+            ensure_ascii=False,
+        )
+        self.assert_items(
+            document, "tracks", json.loads(document)["playlist"]["tracks"]
+        )
+
+    def test_scalars(self):
+        self.assert_items(
+            '{"tracks": [3500.0, -1e5, 12, true, false, null, "x"]}',
+            "tracks",
+            [3500.0, -1e5, 12, True, False, None, "x"],
+        )
+
+    def test_empty(self):
+        self.assert_items('{"tracks": [ ]}', "tracks", [])
+
+    def test_whitespace(self):
+        self.assert_items(
+            '{ "tracks" :\n [ 1 ,\n 2 ]\n }', "tracks", [1, 2]
+        )
+
+    def test_missing_key(self):
+        self.assert_error('{"error": "temporarily unavailable"}', "tracks")
+
+    def test_not_closed(self):
+        self.assert_error('{"tracks": [{"id": "1"}, {"id": "2"}', "tracks")
+
+    def test_truncated_item(self):
+        self.assert_error('{"tracks": [{"id": "1"}, {"id": "2', "tracks")
+
+    def test_truncated_number(self):
+        self.assert_error('{"tracks": [1, 35', "tracks")
+
+    def test_malformed_item(self):
+        self.assert_error('{"tracks": [{"id": "1"}, {id: 2}]}', "tracks")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+from math import ceil
+
+from .query import BaseQuery
+
+PERCENTILES = (50, 90, 99)
+
+
+class Analytics(BaseQuery):
+    """A user's library-wide statistics computed by the database.
+
+    The statistics are aggregated by SQL queries over the saved data, so
+    only the compact results are transferred to Python. The tracks are
+    the distinct tracks of all the user's playlists or of one playlist.
+
+    Args:
+        login: the user's login
+        db: DataCtx object shared with other queries, a new one by default
+    """
+
+    def get_duration_percentiles(self, percentiles: tuple = PERCENTILES,
+                                 playlist_id: int = None) -> dict:
+        """Get the tracks' durations percentiles by the nearest rank.
+
+        :param percentiles: a tuple of percentiles from 0 to 100
+        :param playlist_id: the playlist's id, all the tracks by default
+        :return: a dict with {percentile: duration in ms} items
+        """
+        durations = [
+            i[0] for i in self._select_tracks(
+                """select duration from track
+                   where duration is not null and id in ({tracks})
+                   order by duration""",
+                playlist_id
+            )
+        ]
+        if not durations:
+            return {}
+
+        return {
+            i: durations[max(ceil(i * len(durations) / 100), 1) - 1]
+            for i in percentiles
+        }
+
+    def get_genres_by_decade(self, playlist_id: int = None) -> dict:
+        """Get the genres counters of the release decades.
+
+        :param playlist_id: the playlist's id, all the tracks by default
+        :return: a dict with {decade: {Genre: count}} items ordered by
+          decade, the counters are ordered by count
+        """
+        decades = {}
+        for decade, genre, count in self._select_tracks(
+            """select year / 10 * 10 as decade, genre, count(*) as col
+               from track
+               where year and genre is not null and id in ({tracks})
+               group by decade, genre
+               order by decade, col desc, genre""",
+            playlist_id
+        ):
+            decades.setdefault(decade, {})[genre] = count
+
+        return decades
+
+    def get_summary(self, playlist_id: int = None) -> dict:
+        """Get the tracks' count, total duration and years range.
+
+        :param playlist_id: the playlist's id, all the tracks by default
+        :return: a dict with "tracks", "artists", "duration", "first_year"
+          and "last_year" items
+        """
+        tracks, duration, first_year, last_year = self._select_tracks(
+            """select count(*), coalesce(sum(duration), 0),
+                 min(nullif(year, 0)), max(year)
+               from track
+               where id in ({tracks})""",
+            playlist_id
+        )[0]
+        artists = self._select_tracks(
+            """select count(distinct artist_id)
+               from artist_track
+               where track_id in ({tracks})""",
+            playlist_id
+        )[0][0]
+
+        return {
+            "tracks": tracks,
+            "artists": artists,
+            "duration": duration,
+            "first_year": first_year,
+            "last_year": last_year,
+        }
+
+    def get_top_artists(self, count: int = 10,
+                        playlist_id: int = None) -> dict:
+        """Get the artists with the most tracks.
+
+        :param count: the maximum number of the artists
+        :param playlist_id: the playlist's id, all the tracks by default
+        :return: a dict with {Artist name: tracks count} items ordered by
+          the tracks count
+        """
+        return {
+            i: j for i, j in self._select_tracks(
+                """select a.name, c.col
+                   from (
+                     select artist_id, count(*) as col
+                     from artist_track
+                     where track_id in ({tracks})
+                     group by artist_id) c
+                     inner join artist a on a.id = c.artist_id
+                   order by c.col desc, a.name
+                   limit :count""",
+                playlist_id,
+                count=count
+            )
+        }
+
+    def get_years_histogram(self, bin_size: int = 1,
+                            playlist_id: int = None) -> dict:
+        """Get the tracks' release years histogram.
+
+        :param bin_size: the number of years in a bin
+        :param playlist_id: the playlist's id, all the tracks by default
+        :return: a dict with {first year of a bin: count} items ordered
+          by year, the tracks without a year are skipped
+        """
+        return {
+            i: j for i, j in self._select_tracks(
+                """select year / :bin_size * :bin_size as bin, count(*)
+                   from track
+                   where year and id in ({tracks})
+                   group by bin
+                   order by bin""",
+                playlist_id,
+                bin_size=bin_size
+            )
+        }
+
+    def _select_tracks(self, query, playlist_id, **params):
+        """Select rows by a query limited to the user's tracks.
+
+        :param query: a query string with the {tracks} subquery
+          placeholder and the named parameters
+        :param playlist_id: the playlist's id or None
+        :param params: the query's named parameters
+        """
+        tracks = "select track_id from playlist_track where user_id = :uid"
+        if playlist_id is not None:
+            tracks += " and playlist_id = :playlist_id"
+
+        return self._db.select_all(
+            query.format(tracks=tracks),
+            {"uid": self._uid, "playlist_id": playlist_id, **params}
+        )
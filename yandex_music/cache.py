@@ -0,0 +1,163 @@
+import os
+from sqlite3 import connect
+from threading import Lock
+from time import time
+from zlib import compress, decompress
+
+
+class ResponseCache:
+    """Persistent cache of the site's responses.
+
+    Responses having the ETag or Last-Modified header are stored by URL,
+    so they can be revalidated by conditional requests. The least
+    recently used responses are evicted when the cache exceeds its size.
+
+    Args:
+        path: a path to the cache database file, its directories are
+          created if needed, or ":memory:"
+        max_size: the maximum total size of the stored bodies, in bytes
+    """
+
+    def __init__(self, path: str = "yandex_music/cache/responses.db",
+                 max_size: int = 64 * 1024 * 1024):
+        self._max_size = max_size
+        self._lock = Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """begin;
+            create table if not exists response (
+                url text primary key,
+                etag text,
+                last_modified text,
+                body blob not null,
+                size integer not null,
+                accessed real not null);
+
+            create index if not exists response_accessed
+                on response(accessed);
+
+            create table if not exists response_total (
+                id integer primary key check (id = 1),
+                size integer not null);
+
+            insert or ignore into response_total
+              select 1, coalesce(sum(size), 0) from response;
+
+            create trigger if not exists response_insert
+            after insert on response
+            begin
+                update response_total set size = size + new.size;
+            end;
+
+            create trigger if not exists response_update
+            after update of size on response
+            begin
+                update response_total set size = size - old.size + new.size;
+            end;
+
+            create trigger if not exists response_delete
+            after delete on response
+            begin
+                update response_total set size = size - old.size;
+            end;
+            commit;"""
+        )
+
+    def get(self, url: str):
+        """Get a stored response.
+
+        :param url: the response's URL
+        :return: a tuple with a dict of validation headers and a body
+          or None if the response isn't stored
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "select etag, last_modified, body from response where url = ?",
+                (url,)
+            ).fetchone()
+            if not row:
+                return None
+
+            self._conn.execute(
+                "update response set accessed = ? where url = ?",
+                (time(), url)
+            )
+            self._conn.commit()
+
+        etag, last_modified, body = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        return headers, decompress(body)
+
+    def put(self, url: str, headers, body: bytes):
+        """Store a response if it can be revalidated later.
+
+        :param url: the response's URL
+        :param headers: the response's headers
+        :param body: the response's decoded body
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        body = compress(body)
+        if len(body) > self._max_size:
+            return
+
+        with self._lock:
+            # An upsert, the replaced row's size is subtracted from the
+            # total by the update trigger.
+            self._conn.execute(
+                """insert into response values (?, ?, ?, ?, ?, ?)
+                   on conflict (url) do update set
+                     etag = excluded.etag,
+                     last_modified = excluded.last_modified,
+                     body = excluded.body,
+                     size = excluded.size,
+                     accessed = excluded.accessed""",
+                (url, etag, last_modified, body, len(body), time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        """Delete all the stored responses."""
+        with self._lock:
+            self._conn.execute("delete from response")
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete the least recently used responses over the size.
+
+        The total size is kept by the triggers, so the responses are
+        read only when the cache is over the size.
+        """
+        total = self._conn.execute(
+            "select size from response_total"
+        ).fetchone()[0]
+        if total <= self._max_size:
+            return
+
+        rows = self._conn.execute(
+            "select url, size from response order by accessed"
+        )
+        to_delete = []
+        for url, size in rows:
+            if total <= self._max_size:
+                break
+            to_delete.append((url,))
+            total -= size
+
+        self._conn.executemany("delete from response where url = ?", to_delete)
+
+    def __del__(self):
+        """Close a connection after all operations."""
+        self._conn.close()
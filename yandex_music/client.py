@@ -1,12 +1,23 @@
 import re
+from hashlib import sha1
+from os.path import basename, dirname, join
 
 from urllib3.exceptions import MaxRetryError, TimeoutError
 
+from .analytics import Analytics
+from .cache import ResponseCache
+from .database import MEMORY, PATH, DataCtx
 from .exceptions import LoginError, NetworkError
+from .export import Export
+from .fetcher import Fetcher
+from .library import Library
+from .loader import LIKES_TTL, Loader
 from .log import flash
-from .models import Artist, Playlist, Track, User
+from .network import Connection
 from .query import Query, UserQuery
-from .service import Service
+from .service import KnownIds, Service
+from .snapshot import Snapshot
+from .stats import Stats
 
 
 class Client:
@@ -16,24 +27,120 @@ class Client:
 
     Args:
         login: a Yandex Music account's login
+        connection: Connection object for the requests, a new one with
+          the ResponseCache next to the database by default
+        lazy: load the playlists' tracks and artists on the first access
+        likes_ttl: the lifetime of the saved artists' likes in seconds
+        db: DataCtx object for the queries, a new one by default
+        db_path: a path to the database file of a new DataCtx object or
+          MEMORY for a throwaway in-memory database
+        read_only: open the database of a new DataCtx object for reading
+          only, the user has to be saved there by a writer
+        stats: Stats object measuring the work, e.g. with a callback; the
+          given connection and db report to their own Stats objects
+        snapshot: keep the loaded data in a snapshot next to the database,
+          so the next clients of the user start without the selects
 
     Attributes:
         user: User object
+        analytics: Analytics object with the library-wide statistics
+        export: Export object streaming the user's data to files
+        stats: Stats object with the phases' timings and the requests'
+          and statements' counters
+        library: Library object with the user's data stored by columns,
+          created on the first access
     """
 
-    def __init__(self, login: str):
+    def __init__(self, login: str, connection: Connection = None,
+                 lazy: bool = False, likes_ttl: float = LIKES_TTL,
+                 db: DataCtx = None, db_path: str = PATH,
+                 read_only: bool = False, stats: Stats = None,
+                 snapshot: bool = True):
         self.user = None
+        self.analytics = None
+        self.export = None
+        self.stats = stats or Stats()
 
+        self._library = None
         self._login = self._clean_login(login)
+        self._lazy = lazy
+        self._likes_ttl = likes_ttl
+        self._db = db or DataCtx(db_path, self.stats, read_only)
+        self._connection = connection or Connection(
+            cache=Client._get_cache(self._db), stats=self.stats
+        )
+        # The file is named by the login's hash, so any login is a safe
+        # file name inside the snapshots' directory.
+        self._snapshot = Snapshot(
+            join(
+                dirname(self._db.path),
+                "snapshots",
+                basename(self._db.path),
+                f"{sha1(self._login.encode()).hexdigest()}.bin"
+            )
+        ) if snapshot and self._db.path else None
 
         try:
-            self._service = Service(self._login)
+            self._service = Service(
+                self._login, self._connection, self._db, stats=self.stats
+            )
         except (MaxRetryError, TimeoutError):
             raise NetworkError from None
         else:
             self._set_data()
             flash(msg="USER_SUCCESS")
 
+    @property
+    def library(self):
+        if not self._library:
+            self._library = Library(Query(self._login, self._db))
+        return self._library
+
+    @staticmethod
+    def sync_many(logins: list, connection: Connection = None,
+                  max_workers: int = 4, db_path: str = PATH,
+                  stats: Stats = None) -> dict:
+        """Download or update the data of many users concurrently.
+
+        The users share one connection, one database connection and the
+        ids of the saved tracks and artists. The users' models aren't
+        created. A failure of one user doesn't stop the others.
+
+        :param logins: a list of Yandex Music accounts' logins
+        :param connection: Connection object for all the requests, a new
+          one with the ResponseCache next to the database by default
+        :param max_workers: the maximum number of users synced at once
+        :param db_path: a path to the database file
+        :param stats: Stats object measuring all the users' syncs
+        :return: a dict with {login: None or an exception} items in the
+          logins order, None means success
+        """
+        stats = stats or Stats()
+        db = DataCtx(db_path, stats)
+        connection = connection or Connection(
+            cache=Client._get_cache(db), stats=stats
+        )
+        known = KnownIds()
+
+        def sync(login):
+            try:
+                service = Service(
+                    Client._clean_login(login),
+                    connection,
+                    db,
+                    known=known,
+                    stats=stats
+                )
+                if not service.downloaded:
+                    service.update()
+            except (MaxRetryError, TimeoutError):
+                return NetworkError()
+            except Exception as e:
+                return e
+
+        results = Fetcher(connection, max_workers).run_many(sync, logins)
+        return dict(zip(logins, results))
+
     def update(self):
         """Update client's data."""
         flash(msg="UPD")
@@ -43,6 +150,8 @@ class Client:
         except (MaxRetryError, TimeoutError):
             raise NetworkError from None
 
+        if self._snapshot:
+            self._snapshot.delete()
         self._set_data()
         flash(msg="DONE")
 
@@ -53,61 +162,29 @@ class Client:
 
         return re.sub(r"@ya\w{,4}\.\w{,3}", "", login.strip().lower())
 
-    def _set_data(self):
-        """Create a user and other entities from the database data."""
-        query = Query(self._login)
-        user_query = UserQuery(self._login)
-
-        db_playlists = query.get_user_playlists()
-
-        self._set_user(user_query, len(db_playlists))
-
-        for playlist in db_playlists:
-            self._set_playlists(user_query, playlist)
-
-        for playlist in self.user.playlists:
-            Client._set_tracks_artists(query, playlist)
-
-    def _set_user(self, query, playlists_count):
-        self.user = User(query, self._login, playlists_count, [])
-
-    def _set_playlists(self, query, playlist):
-        self.user.playlists.append(Playlist(query, *playlist, tracks=[]))
-
     @staticmethod
-    def _set_tracks_artists(query, playlist):
-        all_tracks = {
-            i[0]: Track(*i, artists=[], artists_count=0)
-            for i in query.get_playlist_tracks(playlist.id_)
-        }
-        all_artists = {
-            i[0]: Artist(
-                *i, tracks=[], tracks_count=0,
-                genres=query.get_artist_genres(i[0])
-            )
-            for i in query.get_playlist_artists(playlist.id_)
-        }
-
-        Client._bind_artists_to_tracks(query, all_tracks, all_artists)
-        Client._bind_tracks_to_artists(
-            query, all_tracks, all_artists, playlist.id_
-        )
+    def _get_cache(db):
+        """Get the responses' cache stored next to the database.
 
-        playlist.tracks = [i for i in all_tracks.values()]
-        playlist.tracks_count = len(playlist.tracks)
+        The cache of the in-memory or read-only database is in memory.
+        """
+        if not db.path or db.read_only:
+            return ResponseCache(MEMORY)
 
-    @staticmethod
-    def _bind_artists_to_tracks(query, tracks, artists):
-        for track_id, track in tracks.items():
-            artists_ids = query.get_track_artists_ids(track_id)
-            for artist_id in artists_ids:
-                track.artists.append(artists[artist_id])
-            track.artists_count = len(artists_ids)
+        return ResponseCache(join(dirname(db.path), "responses.db"))
 
-    @staticmethod
-    def _bind_tracks_to_artists(query, tracks, artists, playlist_id):
-        for artist_id, artist in artists.items():
-            tracks_ids = query.get_artist_tracks_ids(playlist_id, artist_id)
-            for track_id in tracks_ids:
-                artist.tracks.append(tracks[track_id])
-            artist.tracks_count = len(tracks_ids)
+    def _set_data(self):
+        """Create a user and other entities from the database data."""
+        self._library = None
+        with self.stats.phase("models"):
+            self.analytics = Analytics(self._login, self._db)
+            self.export = Export(self._login, self._db)
+            loader = Loader(
+                Query(self._login, self._db),
+                UserQuery(self._login, self._db),
+                self._connection,
+                self._lazy,
+                self._likes_ttl,
+                self._snapshot,
+            )
+            self.user = loader.load(self._login)
@@ -1,18 +1,90 @@
+import os
+from contextlib import contextmanager
 from sqlite3 import connect
+from threading import RLock
+from time import perf_counter
+from urllib.parse import quote
+
+from .exceptions import ReadOnlyError
+from .stats import Stats
+
+MEMORY = ":memory:"
+PATH = "yandex_music/cache/YandexMusicData.db"
+PRAGMAS = (
+    "PRAGMA foreign_keys = on",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+)
+# The journal's pragmas change the database file.
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode = wal",
+    "PRAGMA synchronous = normal",
+)
 
 
 class DataCtx:
-    """Data context class for storing scraped data in the database."""
+    """Data context class for storing scraped data in the database.
+
+    The database works in the WAL journal mode, so readers aren't blocked
+    while a sync writes. Every statement is committed at once unless it
+    is executed inside the transaction() block.
+
+    One DataCtx object is meant to be shared by all the queries objects
+    of a client. It can be shared by several threads as well, the
+    statements and the transactions of different threads are serialized.
+
+    The database is a file, the directories of which are created if
+    needed, or an in-memory database living as long as the object. Many
+    processes can read a file by the read-only objects while one process
+    writes it. An immutable database is read without any locks and
+    without the WAL journal, it's safe only if no process changes the
+    file and the writer's changes are moved to it by checkpoint().
+
+    Args:
+        path: a path to the database file or MEMORY
+        stats: Stats object counting the statements
+        read_only: open the database for reading only, the changes raise
+          ReadOnlyError
+        immutable: open the read-only database as never changed
+
+    Attributes:
+        path: an absolute path to the database file, None for the
+          in-memory database
+        read_only: True if the database can't be changed
+    """
+
+    def __init__(self, path: str = PATH, stats: Stats = None,
+                 read_only: bool = False, immutable: bool = False):
+        self.path = None if path == MEMORY else os.path.abspath(path)
+        self.read_only = read_only or immutable
+        self._stats = stats
+
+        self._conn = self._connect(immutable)
+        pragmas = PRAGMAS if self.read_only else PRAGMAS + WRITER_PRAGMAS
+        for pragma in pragmas:
+            self._conn.execute(pragma)
 
-    def __init__(self):
-        self._conn = connect("yandex_music/cache/YandexMusicData.db")
         self._cursor = self._conn.cursor()
+        self._depth = 0
+        self._lock = RLock()
+
+    def check_writable(self):
+        """Raise ReadOnlyError if the database can't be changed."""
+        if self.read_only:
+            raise ReadOnlyError(self.path)
+
+    def checkpoint(self):
+        """Move the changes from the WAL journal to the database file."""
+        self.check_writable()
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(truncate)")
 
     def execute(self, query: str, *params):
         """Execute SQl scripts.
 
         :param query: a query string
         :param params: a query parameters
+        :return: the number of changed rows
         """
         return self._exec(query, *params)
 
@@ -29,8 +101,67 @@ class DataCtx:
 
         :param script: a string with queries
         """
-        self._cursor.executescript(script)
-        self._conn.commit()
+        self.check_writable()
+        with self._lock:
+            start = perf_counter()
+            self._cursor.executescript(script)
+            self._conn.commit()
+            self._count(script, start)
+
+    @contextmanager
+    def transaction(self):
+        """Execute all the statements inside the block in one transaction.
+
+        The transaction is begun explicitly, so the selects of the block
+        read one state of the database even while other connections
+        write, the read-only databases can use it as well. It's committed
+        at the end of the block or rolled back on an exception. Nested
+        blocks are parts of the outer one. Other threads wait for the end
+        of the transaction.
+        """
+        with self._lock:
+            if not self._depth:
+                self._conn.execute("begin")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    self._conn.rollback()
+                raise
+
+            self._depth -= 1
+            if not self._depth:
+                self._conn.commit()
+
+    def iterate(self, query: str, *params, size: int = 1000):
+        """Select rows from a table by parts.
+
+        The rows are fetched from a separate cursor by `size` rows, so
+        only one part is in memory at once. The lock is held while a part
+        is fetched only, the other statements can be executed between
+        the parts.
+
+        :param query: a query string
+        :param params: a query parameters
+        :param size: the number of rows fetched at once
+        :return: a generator of the selected records
+        """
+        with self._lock:
+            start = perf_counter()
+            cursor = self._conn.execute(query, *params)
+            self._count(query, start)
+
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
 
     def select(self, query: str, *params):
         """Select rows from a table.
@@ -50,20 +181,49 @@ class DataCtx:
         """
         return self._select(query, *params, is_all=True)
 
+    def _connect(self, immutable):
+        """Connect to the database by the path or the read-only URI."""
+        if not self.path:
+            return connect(MEMORY, check_same_thread=False)
+
+        if not self.read_only:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            return connect(self.path, check_same_thread=False)
+
+        uri = f"file:{quote(self.path)}?mode=ro"
+        if immutable:
+            uri += "&immutable=1"
+        return connect(uri, uri=True, check_same_thread=False)
+
+    def _count(self, query, start):
+        if self._stats:
+            self._stats.add_statement(query, perf_counter() - start)
+
     def _exec(self, query: str, *params, is_many: bool = False):
-        if is_many:
-            self._cursor.executemany(query, *params)
-        else:
-            self._cursor.execute(query, *params)
+        self.check_writable()
+        with self._lock:
+            start = perf_counter()
+            if is_many:
+                self._cursor.executemany(query, *params)
+            else:
+                self._cursor.execute(query, *params)
 
-        self._conn.commit()
+            if not self._depth:
+                self._conn.commit()
+
+            self._count(query, start)
+            return self._cursor.rowcount
 
     def _select(self, query: str, *params, is_all: bool = False):
-        self._cursor.execute(query, *params)
-        if is_all:
-            rows = self._cursor.fetchall()
-        else:
-            rows = self._cursor.fetchone()
+        with self._lock:
+            start = perf_counter()
+            self._cursor.execute(query, *params)
+            if is_all:
+                rows = self._cursor.fetchall()
+            else:
+                rows = self._cursor.fetchone()
+
+            self._count(query, start)
 
         return rows
 
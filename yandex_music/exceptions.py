@@ -18,6 +18,13 @@ class NetworkError(BaseError):
         super().__init__("Bad connection! Please, try again.")
 
 
+class ReadOnlyError(BaseError):
+    """Raised if a read-only database is changed."""
+
+    def __init__(self, path):
+        super().__init__(f"The database '{path}' is opened read-only!")
+
+
 class UserError(BaseError):
     """Base exception for a user's profile errors."""
 
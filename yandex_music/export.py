@@ -0,0 +1,215 @@
+import csv
+import json
+from os.path import join
+
+from .database import DataCtx
+from .exceptions import UserDoesNotExistError
+from .query import BaseQuery
+
+try:
+    import pyarrow
+    from pyarrow import parquet
+except ImportError:
+    pyarrow = None
+
+BATCH_SIZE = 10000
+# {entity: ((column, type), ...)}, the types are pyarrow's aliases
+ENTITIES = {
+    "users": (
+        ("id", "int64"),
+        ("login", "string"),
+        ("name", "string"),
+        ("playlists_count", "int64"),
+    ),
+    "playlists": (
+        ("user_id", "int64"),
+        ("id", "int64"),
+        ("title", "string"),
+        ("tracks_count", "int64"),
+        ("duration", "int64"),
+        ("modified", "string"),
+    ),
+    "tracks": (
+        ("id", "int64"),
+        ("title", "string"),
+        ("year", "int64"),
+        ("genre", "string"),
+        ("duration", "int64"),
+    ),
+    "artists": (
+        ("id", "int64"),
+        ("name", "string"),
+    ),
+    "playlist_tracks": (
+        ("user_id", "int64"),
+        ("playlist_id", "int64"),
+        ("track_id", "int64"),
+    ),
+    "artist_tracks": (
+        ("artist_id", "int64"),
+        ("track_id", "int64"),
+    ),
+}
+FORMATS = ("jsonl", "csv", "parquet")
+
+
+class Export(BaseQuery):
+    """A user's or the whole database's data export.
+
+    The rows are streamed from the database cursors straight to the
+    writers, so the memory usage doesn't depend on the library's size
+    and the models aren't created. The entities are the tables of
+    ENTITIES: users, playlists, tracks, artists and the playlists' and
+    artists' tracks memberships.
+
+    The Parquet export requires pyarrow, the rows are written by row
+    groups of `batch_size` rows.
+
+    Args:
+        login: the user's login, None for all the users
+        db: DataCtx object shared with other queries, a new one by default
+    """
+
+    def __init__(self, login: str = None, db: DataCtx = None):
+        super().__init__(login, db)
+
+        if login is not None and self._uid is None:
+            raise UserDoesNotExistError(login)
+
+    def export(self, directory: str, fmt: str = "jsonl") -> list:
+        """Write all the entities to the files of a directory.
+
+        The files are named by the entities, e.g. "tracks.jsonl".
+
+        :param directory: the path to an existing directory
+        :param fmt: the files' format, "jsonl", "csv" or "parquet"
+        :return: a list of the written files' paths
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'.")
+
+        paths = []
+        for entity in ENTITIES:
+            path = join(directory, f"{entity}.{fmt}")
+            if fmt == "parquet":
+                self.write_parquet(entity, path)
+            else:
+                with open(path, "w", encoding="utf-8", newline="") as file:
+                    if fmt == "csv":
+                        self.write_csv(entity, file)
+                    else:
+                        self.write_jsonl(entity, file)
+            paths.append(path)
+
+        return paths
+
+    def iter_rows(self, entity: str):
+        """Get a generator of an entity's rows.
+
+        :param entity: the entity's name, a key of ENTITIES
+        :return: a generator of tuples with the ENTITIES columns' values
+        """
+        columns = ", ".join(i[0] for i in ENTITIES[entity])
+        table, condition = self._get_source(entity)
+        query = f"select {columns} from {table}"
+        if self._uid is not None:
+            query += f" where {condition}"
+
+        return self._db.iterate(query, {"uid": self._uid})
+
+    def write_csv(self, entity: str, file) -> int:
+        """Write an entity's rows to a CSV file with a header.
+
+        :param entity: the entity's name, a key of ENTITIES
+        :param file: a text file object opened with newline=""
+        :return: the number of written rows
+        """
+        writer = csv.writer(file)
+        writer.writerow(i[0] for i in ENTITIES[entity])
+
+        count = 0
+        for row in self.iter_rows(entity):
+            writer.writerow(row)
+            count += 1
+
+        return count
+
+    def write_jsonl(self, entity: str, file) -> int:
+        """Write an entity's rows to a JSON Lines file.
+
+        :param entity: the entity's name, a key of ENTITIES
+        :param file: a text file object
+        :return: the number of written rows
+        """
+        columns = [i[0] for i in ENTITIES[entity]]
+        encode = json.JSONEncoder(
+            ensure_ascii=False, check_circular=False
+        ).encode
+
+        count = 0
+        for row in self.iter_rows(entity):
+            file.write(f"{encode(dict(zip(columns, row)))}\n")
+            count += 1
+
+        return count
+
+    def write_parquet(self, entity: str, path: str,
+                      batch_size: int = BATCH_SIZE) -> int:
+        """Write an entity's rows to a Parquet file.
+
+        :param entity: the entity's name, a key of ENTITIES
+        :param path: the file's path
+        :param batch_size: the number of rows in a row group
+        :return: the number of written rows
+        """
+        if not pyarrow:
+            raise ImportError("The Parquet export requires pyarrow.")
+
+        schema = pyarrow.schema(
+            [(i, pyarrow.type_for_alias(j)) for i, j in ENTITIES[entity]]
+        )
+
+        count = 0
+        with parquet.ParquetWriter(path, schema) as writer:
+            batch = []
+            for row in self.iter_rows(entity):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    writer.write_table(self._get_table(batch, schema))
+                    count += len(batch)
+                    batch = []
+
+            if batch:
+                writer.write_table(self._get_table(batch, schema))
+                count += len(batch)
+
+        return count
+
+    @staticmethod
+    def _get_source(entity):
+        """Get an entity's table and the user's rows condition."""
+        tracks = "select track_id from playlist_track where user_id = :uid"
+        return {
+            "users": ("user", "id = :uid"),
+            "playlists": ("playlist", "user_id = :uid"),
+            "tracks": ("track", f"id in ({tracks})"),
+            "artists": (
+                "artist",
+                f"""id in (
+                      select artist_id from artist_track
+                      where track_id in ({tracks}))""",
+            ),
+            "playlist_tracks": ("playlist_track", "user_id = :uid"),
+            "artist_tracks": ("artist_track", f"track_id in ({tracks})"),
+        }[entity]
+
+    @staticmethod
+    def _get_table(rows, schema):
+        """Get a pyarrow table from the rows."""
+        return pyarrow.Table.from_arrays(
+            [
+                pyarrow.array([i[j] for i in rows], type=field.type)
+                for j, field in enumerate(schema)
+            ],
+            schema=schema
+        )
@@ -0,0 +1,73 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .network import Connection
+
+
+class Fetcher:
+    """Download many responses from the Yandex Music site concurrently.
+
+    Blocking requests are run in a thread pool driven by an asyncio event
+    loop, so no more than `max_workers` requests are in flight at once.
+
+    Args:
+        connection: Connection object used for all the requests
+        max_workers: the maximum number of simultaneous requests
+    """
+
+    def __init__(self, connection: Connection = None, max_workers: int = 8):
+        self._connection = connection or Connection()
+        self._max_workers = max_workers
+
+    def get_many(self, subject: str, args: list) -> list:
+        """Get many responses in the JSON format.
+
+        :param subject: a key of the network.URLS dict
+        :param args: a list of tuples with the URL arguments
+        :return: a list of responses in the order of the arguments
+        """
+        return self.run_many(
+            lambda i: self._connection.get_json(subject, *i), args
+        )
+
+    async def fetch_many(self, subject: str, args: list) -> list:
+        """Get many responses in the JSON format asynchronously.
+
+        :param subject: a key of the network.URLS dict
+        :param args: a list of tuples with the URL arguments
+        :return: a list of responses in the order of the arguments
+        """
+        return await self._gather(
+            lambda i: self._connection.get_json(subject, *i), args
+        )
+
+    def run_many(self, func, args: list) -> list:
+        """Call a blocking function for every argument concurrently.
+
+        :param func: a function making requests
+        :param args: a list of the function's arguments
+        :return: a list of results in the order of the arguments
+        """
+        coro = self._gather(func, args)
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+
+        # The caller is already inside an event loop, which can't be
+        # blocked by asyncio.run(), so a new loop is started in a thread.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coro).result()
+
+    async def _gather(self, func, args):
+        if not args:
+            return []
+
+        loop = asyncio.get_running_loop()
+        workers = min(self._max_workers, len(args))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return await asyncio.gather(
+                *[loop.run_in_executor(executor, func, i) for i in args]
+            )
@@ -0,0 +1,365 @@
+from array import array
+from collections import Counter
+
+from .models import Track
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NO_GENRE = -1
+NO_YEAR = 0
+
+
+class Library:
+    """A user's library stored by columns.
+
+    Tracks and artists are rows of typed arrays, genres are interned into
+    integer codes, and the track <-> artist and playlist -> track links
+    are stored as CSR adjacency arrays (`indptr` and `indices`). Track and
+    artist objects are created on demand as lightweight views over rows.
+
+    Aggregates are computed by NumPy over the arrays if it is installed,
+    otherwise by plain Python.
+
+    Args:
+        query: Query object for the data selection
+
+    Attributes:
+        genres: a list of the genres names indexed by code
+        playlists_ids: an array of the playlists' ids
+        playlists_titles: a list of the playlists' titles
+        tracks_count: the number of distinct tracks
+        artists_count: the number of distinct artists
+    """
+
+    def __init__(self, query):
+        self.genres = []
+        self.playlists_ids = array("q")
+        self.playlists_titles = []
+
+        self._tracks_ids = array("q")
+        self._tracks_titles = []
+        self._tracks_years = array("i")
+        self._tracks_genres = array("i")
+        self._tracks_durations = array("q")
+
+        self._artists_ids = array("q")
+        self._artists_names = []
+
+        # All the relations are read from one state of the database, so
+        # a concurrent sync can't leave links to missing rows.
+        with query.transaction():
+            self._load(query)
+
+        self.tracks_count = len(self._tracks_ids)
+        self.artists_count = len(self._artists_ids)
+
+    def get_artist(self, artist_id: int):
+        """Get an artist's view by the artist's id."""
+        return ArtistView(self, self._artists_rows[artist_id])
+
+    def get_artists_counter(self, playlist_id: int = None) -> dict:
+        """Get a dict with {Artist name: count} items.
+
+        :param playlist_id: the playlist's id, all the tracks by default
+        """
+        rows = self._get_tracks_rows(playlist_id)
+
+        if numpy is not None:
+            indptr = _as_numpy(self._track_artists[0])
+            owners = numpy.repeat(
+                numpy.arange(self.tracks_count), numpy.diff(indptr)
+            )
+            mask = numpy.zeros(self.tracks_count, dtype=bool)
+            mask[_get_index(rows)] = True
+            artists = _as_numpy(self._track_artists[1])[mask[owners]]
+            counts = numpy.bincount(artists, minlength=self.artists_count)
+            counter = {
+                self._artists_names[i]: int(counts[i])
+                for i in numpy.flatnonzero(counts)
+            }
+        else:
+            indptr, indices = self._track_artists
+            counter = Counter(
+                self._artists_names[indices[i]]
+                for row in rows
+                for i in range(indptr[row], indptr[row + 1])
+            )
+
+        return _sort_counter(counter)
+
+    def get_duration(self, playlist_id: int = None) -> int:
+        """Get the total duration in milliseconds.
+
+        :param playlist_id: the playlist's id, all the tracks by default
+        """
+        rows = self._get_tracks_rows(playlist_id)
+
+        if numpy is not None:
+            return int(
+                _as_numpy(self._tracks_durations)[_get_index(rows)].sum()
+            )
+
+        return sum(self._tracks_durations[i] for i in rows)
+
+    def get_genres_counter(self, playlist_id: int = None) -> dict:
+        """Get a dict with {Genre: count} items.
+
+        :param playlist_id: the playlist's id, all the tracks by default
+        """
+        codes = self._take(self._tracks_genres, playlist_id)
+
+        return _sort_counter(
+            {
+                self.genres[code]: count
+                for code, count in _count(codes).items()
+                if code != NO_GENRE
+            }
+        )
+
+    def get_playlist_tracks(self, playlist_id: int) -> list:
+        """Get a list of views of the playlist's tracks."""
+        return [
+            TrackView(self, i) for i in self._get_tracks_rows(playlist_id)
+        ]
+
+    def get_track(self, track_id: int):
+        """Get a track's view by the track's id."""
+        return TrackView(self, self._tracks_rows[track_id])
+
+    def get_years_counter(self, playlist_id: int = None) -> dict:
+        """Get a dict with {Year: count} items ordered by year.
+
+        :param playlist_id: the playlist's id, all the tracks by default
+        """
+        years = self._take(self._tracks_years, playlist_id)
+
+        return {
+            year: count
+            for year, count in sorted(_count(years).items())
+            if year != NO_YEAR
+        }
+
+    def _get_tracks_rows(self, playlist_id):
+        """Get the tracks' rows of a playlist or of the whole library."""
+        if playlist_id is None:
+            return range(self.tracks_count)
+
+        indptr, indices = self._playlist_tracks
+        row = self._playlists_rows[playlist_id]
+
+        return indices[indptr[row]:indptr[row + 1]]
+
+    def _load(self, query):
+        genres = {}
+        for id_, title, year, genre, duration in query.get_user_tracks():
+            if genre is not None and genre not in genres:
+                genres[genre] = len(self.genres)
+                self.genres.append(genre)
+
+            self._tracks_ids.append(id_)
+            self._tracks_titles.append(title)
+            self._tracks_years.append(year or NO_YEAR)
+            self._tracks_genres.append(genres.get(genre, NO_GENRE))
+            self._tracks_durations.append(duration or 0)
+
+        for id_, name in query.get_user_artists():
+            self._artists_ids.append(id_)
+            self._artists_names.append(name)
+
+        for id_, title, *_ in query.get_user_playlists():
+            self.playlists_ids.append(id_)
+            self.playlists_titles.append(title)
+
+        self._tracks_rows = _get_rows(self._tracks_ids)
+        self._artists_rows = _get_rows(self._artists_ids)
+        self._playlists_rows = _get_rows(self.playlists_ids)
+
+        track_artist = [
+            (self._tracks_rows[track_id], self._artists_rows[artist_id])
+            for artist_id, track_id in query.get_user_artist_track()
+        ]
+        self._track_artists = _get_csr(track_artist, len(self._tracks_ids))
+        self._artist_tracks = _get_csr(
+            [(j, i) for i, j in track_artist], len(self._artists_ids)
+        )
+        self._playlist_tracks = _get_csr(
+            [
+                (self._playlists_rows[i], self._tracks_rows[j])
+                for i, j in query.get_user_playlist_track()
+            ],
+            len(self.playlists_ids)
+        )
+
+    def _take(self, column, playlist_id):
+        """Get a column's values of a playlist or of the whole library."""
+        if playlist_id is None:
+            return column
+
+        rows = self._get_tracks_rows(playlist_id)
+        if numpy is not None:
+            return _as_numpy(column)[_get_index(rows)]
+
+        return [column[i] for i in rows]
+
+
+class ArtistView:
+    """An artist's view over a row of the Library.
+
+    Attributes:
+        id_:
+        name:
+        tracks:
+        tracks_count:
+        genres:
+    """
+
+    __slots__ = ("_library", "_row")
+
+    def __init__(self, library: Library, row: int):
+        self._library = library
+        self._row = row
+
+    @property
+    def id_(self):
+        return self._library._artists_ids[self._row]
+
+    @property
+    def name(self):
+        return self._library._artists_names[self._row]
+
+    @property
+    def tracks(self):
+        indptr, indices = self._library._artist_tracks
+        return [
+            TrackView(self._library, indices[i])
+            for i in range(indptr[self._row], indptr[self._row + 1])
+        ]
+
+    @property
+    def tracks_count(self):
+        indptr = self._library._artist_tracks[0]
+        return indptr[self._row + 1] - indptr[self._row]
+
+    @property
+    def genres(self):
+        return list(dict.fromkeys(i.genre for i in self.tracks))
+
+    def __str__(self):
+        return f"Artist({self.name}, {self.tracks_count} track(s))"
+
+
+class TrackView:
+    """A track's view over a row of the Library.
+
+    Attributes:
+        id_:
+        title:
+        artists:
+        artists_count:
+        year:
+        genre:
+        duration: duration in the "%M min. %S sec." format
+        duration_ms: duration in milliseconds
+    """
+
+    __slots__ = ("_library", "_row")
+
+    def __init__(self, library: Library, row: int):
+        self._library = library
+        self._row = row
+
+    @property
+    def id_(self):
+        return self._library._tracks_ids[self._row]
+
+    @property
+    def title(self):
+        return self._library._tracks_titles[self._row]
+
+    @property
+    def artists(self):
+        indptr, indices = self._library._track_artists
+        return [
+            ArtistView(self._library, indices[i])
+            for i in range(indptr[self._row], indptr[self._row + 1])
+        ]
+
+    @property
+    def artists_count(self):
+        indptr = self._library._track_artists[0]
+        return indptr[self._row + 1] - indptr[self._row]
+
+    @property
+    def year(self):
+        year = self._library._tracks_years[self._row]
+        return year if year != NO_YEAR else None
+
+    @property
+    def genre(self):
+        code = self._library._tracks_genres[self._row]
+        return self._library.genres[code] if code != NO_GENRE else None
+
+    @property
+    def duration_ms(self):
+        return self._library._tracks_durations[self._row]
+
+    @property
+    def duration(self):
+        return Track._format_ms(self.duration_ms)
+
+    def __str__(self):
+        return f"{' ft. '.join([i.name for i in self.artists])}"\
+               f" - {self.title}"
+
+
+def _as_numpy(values):
+    if isinstance(values, array):
+        return numpy.frombuffer(values, dtype=values.typecode)
+
+    return numpy.asarray(values)
+
+
+def _count(values) -> dict:
+    if numpy is not None:
+        keys, counts = numpy.unique(_as_numpy(values), return_counts=True)
+        return dict(zip(keys.tolist(), counts.tolist()))
+
+    return Counter(values)
+
+
+def _get_csr(pairs: list, size: int) -> tuple:
+    """Get CSR adjacency arrays from a list of (row, column) pairs.
+
+    :param pairs: a list of (row, column) tuples
+    :param size: the number of rows
+    :return: a tuple with the indptr and the indices arrays
+    """
+    indptr = array("q", [0] * (size + 1))
+    for row, _ in pairs:
+        indptr[row + 1] += 1
+    for i in range(size):
+        indptr[i + 1] += indptr[i]
+
+    indices = array("i", [0] * len(pairs))
+    position = array("q", indptr[:-1])
+    for row, column in pairs:
+        indices[position[row]] = column
+        position[row] += 1
+
+    return indptr, indices
+
+
+def _get_index(rows):
+    """Get a NumPy index of the rows."""
+    return slice(None) if isinstance(rows, range) else _as_numpy(rows)
+
+
+def _get_rows(ids) -> dict:
+    return {j: i for i, j in enumerate(ids)}
+
+
+def _sort_counter(counter) -> dict:
+    return dict(sorted(counter.items(), key=lambda i: (-i[1], i[0])))
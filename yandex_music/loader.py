@@ -0,0 +1,259 @@
+from collections import defaultdict
+from contextlib import suppress
+from json import JSONDecodeError
+from time import time
+
+from urllib3.exceptions import HTTPError
+
+from .exceptions import ReadOnlyError
+from .fetcher import Fetcher
+from .models import Artist, Playlist, Track, User
+from .network import Connection
+from .snapshot import Snapshot
+
+LIKES_TTL = 24 * 60 * 60
+
+
+class Loader:
+    """A user's models building from the database data.
+
+    The whole User -> Playlist -> Track <-> Artist graph is selected by a
+    few bulk queries, one per relation for all the playlists at once, so
+    the number of queries doesn't depend on the library size.
+
+    In the lazy mode only the user and the playlists are created at once,
+    and the tracks, artists and genres are selected on the first access.
+
+    Every track and artist is created once and kept in the identity map,
+    so the playlists share the same Track objects and an artist's tracks
+    cover all the user's playlists.
+
+    The artists' likes are saved to the database and requested again
+    only when they are older than `likes_ttl` seconds.
+
+    The rows of the whole graph can be kept in a snapshot, then a new
+    loader reads them from the snapshot's file while the database's
+    revision is the same, and no data is selected.
+
+    Args:
+        query: Query object for the data selection
+        user_query: UserQuery object for the User and Playlist objects
+        connection: Connection object for the Artist objects
+        lazy: load the models on the first access
+        likes_ttl: the lifetime of the saved likes in seconds
+        snapshot: Snapshot object for the rows of the whole graph, it
+          isn't used in the lazy mode
+    """
+
+    def __init__(self, query, user_query, connection=None,
+                 lazy: bool = False, likes_ttl: float = LIKES_TTL,
+                 snapshot: Snapshot = None):
+        self._query = query
+        self._user_query = user_query
+        self._connection = connection
+        self._lazy = lazy
+        self._likes_ttl = likes_ttl
+        self._snapshot = snapshot
+
+        self._artists = {}
+        self._tracks = {}
+
+    def load(self, login: str) -> User:
+        """Create the user with all the playlists, tracks and artists.
+
+        :param login: the user's login
+        :return: User object
+        """
+        if self._lazy:
+            db_playlists = self._query.get_user_playlists()
+        else:
+            db_playlists, *rows = self._get_rows()
+
+        user = User(
+            self._user_query, login, len(db_playlists), [], loader=self
+        )
+
+        for playlist in db_playlists:
+            user.playlists.append(
+                Playlist(self._user_query, *playlist, loader=self)
+            )
+
+        if not self._lazy:
+            self._load_all(user.playlists, *rows)
+
+        return user
+
+    def get_artist_tracks(self, artist):
+        return [
+            self._get_track(i)
+            for i in self._query.get_artist_tracks(artist.id_)
+        ]
+
+    def get_artists(self, track):
+        return [
+            self._get_artist(i)
+            for i in self._query.get_track_artists(track.id_)
+        ]
+
+    def get_artists_likes(self, tracks) -> dict:
+        """Get the likes of the tracks' artists.
+
+        :param tracks: a list of Track objects
+        :return: a dict with {Artist name: likes count} items sorted by
+          the likes, the artists without a profile or likes are skipped
+        """
+        artists = {j.id_: j for i in tracks for j in i.artists}
+        likes = self.get_likes(list(artists))
+
+        return dict(
+            sorted(
+                [(artists[i].name, j) for i, j in likes.items() if j > 0],
+                key=lambda i: i[1],
+                reverse=True
+            )
+        )
+
+    def get_genres(self, artist):
+        return self._query.get_artist_genres(artist.id_)
+
+    def get_likes(self, ids: list) -> dict:
+        """Get the artists' likes from the database or the site.
+
+        The missing and stale likes are requested concurrently and saved
+        unless the database is read-only. The artists whose requests
+        failed are skipped, the other likes are saved anyway.
+
+        :param ids: a list of the artists' ids
+        :return: a dict with {artist id: likes count} items
+        """
+        now = time()
+        likes = self._query.get_artists_likes(ids, now - self._likes_ttl)
+
+        stale = [i for i in ids if i not in likes]
+        if stale:
+            if not self._connection:
+                self._connection = Connection()
+
+            fetched = {
+                i: j for i, j in zip(
+                    stale,
+                    Fetcher(self._connection).run_many(
+                        self._request_likes, stale
+                    )
+                )
+                if j is not None
+            }
+            likes.update(fetched)
+
+            # The read-only readers don't save the likes.
+            with suppress(ReadOnlyError):
+                self._query.insert_artists_likes(
+                    [(i, j, now) for i, j in fetched.items()]
+                )
+
+        return likes
+
+    def get_tracks(self, playlist):
+        return [
+            self._get_track(i)
+            for i in self._query.get_playlist_tracks(playlist.id_)
+        ]
+
+    def search_artists(self, text: str, limit: int) -> list:
+        return [
+            self._get_artist(i)
+            for i in self._query.search_artists(text, limit)
+        ]
+
+    def search_tracks(self, text: str, playlist_id: int,
+                      limit: int) -> list:
+        return [
+            self._get_track(i)
+            for i in self._query.search_tracks(text, playlist_id, limit)
+        ]
+
+    def _get_artist(self, db_artist, **kwargs):
+        """Get an artist from the identity map or create a new one."""
+        artist = self._artists.get(db_artist[0])
+        if not artist:
+            artist = self._artists[db_artist[0]] = Artist(
+                *db_artist,
+                connection=self._connection,
+                loader=self,
+                **kwargs
+            )
+
+        return artist
+
+    def _get_track(self, db_track, **kwargs):
+        """Get a track from the identity map or create a new one."""
+        track = self._tracks.get(db_track[0])
+        if not track:
+            track = self._tracks[db_track[0]] = Track(
+                *db_track, loader=self, **kwargs
+            )
+
+        return track
+
+    def _get_rows(self):
+        """Get the rows of the whole graph.
+
+        The rows are read from the snapshot if it's valid, otherwise they
+        are selected by one query per relation and saved to the snapshot.
+        The revision and the rows are read in one transaction, so they
+        match each other even if another process syncs meanwhile.
+        """
+        with self._query.transaction():
+            if self._snapshot:
+                revision = self._query.get_revision()
+                rows = self._snapshot.load(revision)
+                if rows is not None:
+                    return rows
+
+            rows = (
+                self._query.get_user_playlists(),
+                self._query.get_user_tracks(),
+                self._query.get_user_artists_genres(),
+                self._query.get_user_artists(),
+                self._query.get_user_artist_track(),
+                self._query.get_user_playlist_track(),
+            )
+
+        if self._snapshot:
+            self._snapshot.save(revision, rows)
+
+        return rows
+
+    def _load_all(self, playlists, db_tracks, db_genres, db_artists,
+                  artist_track, playlist_track):
+        """Create all the user's models from the rows of the graph."""
+        for db_track in db_tracks:
+            self._get_track(db_track, artists=[])
+
+        genres = defaultdict(list)
+        for artist_id, genre in db_genres:
+            genres[artist_id].append(genre)
+
+        for db_artist in db_artists:
+            self._get_artist(
+                db_artist, tracks=[], genres=genres[db_artist[0]]
+            )
+
+        for artist_id, track_id in artist_track:
+            self._tracks[track_id].artists.append(self._artists[artist_id])
+            self._artists[artist_id].tracks.append(self._tracks[track_id])
+
+        tracks = defaultdict(list)
+        for playlist_id, track_id in playlist_track:
+            tracks[playlist_id].append(self._tracks[track_id])
+
+        for playlist in playlists:
+            playlist.tracks = tracks[playlist.id_]
+            playlist.tracks_count = len(playlist.tracks)
+
+    def _request_likes(self, _id):
+        """Request an artist's likes, None if the request failed."""
+        try:
+            return Artist.request_likes(self._connection, _id)
+        except (HTTPError, JSONDecodeError):
+            return None
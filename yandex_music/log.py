@@ -15,9 +15,24 @@ MSG = {
 }
 
 
+_verbose = True
+
+
 def flash(**kwargs):
-    """Print various kinds of information."""
+    """Print various kinds of information unless it's turned off."""
+    if not _verbose:
+        return
+
     key = kwargs["msg"]
     login = kwargs.get("login")
 
     print(MSG[key].format(login) if login else MSG[key])
+
+
+def set_verbose(verbose: bool):
+    """Turn the printing of the messages on or off.
+
+    :param verbose: False to silence all the messages
+    """
+    global _verbose
+    _verbose = verbose
@@ -1,19 +1,26 @@
 from datetime import datetime, timezone
 
-from .exceptions import LikesError, ProfileError
+from .exceptions import LikesError, NetworkError, ProfileError
 from .log import flash
 from .network import Connection
 
+NO_PROFILE = -1
+
 
 class Artist:
     """An artist's data storing class.
 
+    The tracks and genres, if not given, are loaded by the loader on the
+    first access.
+
     Args:
         id_: the artist's real id
         name: the artist's name
         tracks: a list of the artist's tracks
         tracks_count: the artist's tracks count
         genres: the artist's genres
+        connection: Connection object for the requests
+        loader: Loader object for the lazy loading
 
     Attributes:
         id_:
@@ -26,44 +33,110 @@ class Artist:
     __slots__ = (
         "id_",
         "name",
-        "tracks",
-        "tracks_count",
-        "genres",
-        "_likes"
+        "_tracks",
+        "_tracks_count",
+        "_genres",
+        "_likes",
+        "_connection",
+        "_loader"
     )
 
-    def __init__(self, id_: int, name: str, tracks: list,
-                 tracks_count: int, genres: list):
+    def __init__(self, id_: int, name: str, tracks: list = None,
+                 tracks_count: int = None, genres: list = None,
+                 connection: Connection = None, loader=None):
         self.id_ = id_
         self.name = name
-        self.tracks = tracks
-        self.tracks_count = tracks_count
-        self.genres = genres
+        self._tracks = tracks
+        self._tracks_count = tracks_count
+        self._genres = genres
 
         self._likes = None
+        self._connection = connection
+        self._loader = loader
+
+    @property
+    def tracks(self):
+        if self._tracks is None:
+            self._tracks = self._loader.get_artist_tracks(self)
+        return self._tracks
+
+    @tracks.setter
+    def tracks(self, value):
+        self._tracks = value
+
+    @property
+    def tracks_count(self):
+        if self._tracks_count is None:
+            self._tracks_count = len(self.tracks)
+        return self._tracks_count
+
+    @tracks_count.setter
+    def tracks_count(self, value):
+        self._tracks_count = value
+
+    @property
+    def genres(self):
+        if self._genres is None:
+            self._genres = self._loader.get_genres(self)
+        return self._genres
+
+    @genres.setter
+    def genres(self, value):
+        self._genres = value
 
     def get_likes(self):
-        """Get the amount of the artist's likes."""
-        if self._likes:
-            return self._likes
+        """Get the amount of the artist's likes.
+
+        The likes are kept by the loader in the database and requested
+        again only when they are older than the loader's TTL.
+        """
+        if self._likes is None:
+            if self._loader:
+                likes = self._loader.get_likes([self.id_])
+                if self.id_ not in likes:
+                    raise NetworkError()
+                self._likes = likes[self.id_]
+            else:
+                if not self._connection:
+                    self._connection = Connection()
+                self._likes = Artist.request_likes(
+                    self._connection, self.id_
+                )
+
+        if self._likes == NO_PROFILE:
+            raise ProfileError(self.name)
+
+        if not self._likes:
+            raise LikesError(self.name)
+
+        return self._likes
+
+    @staticmethod
+    def request_likes(connection: Connection, _id: int) -> int:
+        """Request the amount of an artist's likes from the site.
 
-        js = Connection().get_json("artist", self.id_)
+        :param connection: Connection object for the request
+        :param _id: the artist's id
+        :return: the likes count, 0 if there are no likes or NO_PROFILE
+          if the artist has no profile
+        """
+        js = connection.get_json("artist", _id)
 
         artist = js.get("artist")
         if not artist:
-            raise ProfileError(self.name)
+            return NO_PROFILE
 
-        likes = artist.get("likesCount")
-        if not likes:
-            raise LikesError(self.name)
+        return artist.get("likesCount") or 0
 
     def __str__(self):
-        return f"Artist({self.name}, {len(self.tracks)} track(s))"
+        return f"Artist({self.name}, {self.tracks_count} track(s))"
 
 
 class Playlist:
     """A playlist's data storing class.
 
+    The tracks, if not given, are loaded by the loader on the first access.
+
     Args:
         query: UserQuery object for queries execution
         id_: the playlist's kind value
@@ -72,6 +145,7 @@ class Playlist:
         tracks_count: the playlist's tracks count
         duration: total duration of the playlist
         modified: last modified datetime
+        loader: Loader object for the lazy loading of the tracks
 
     Attributes:
         id_:
@@ -86,31 +160,51 @@ class Playlist:
     __slots__ = (
         "id_",
         "title",
-        "tracks",
         "tracks_count",
         "duration_ms",
         "duration",
         "modified",
-        "_query"
+        "_tracks",
+        "_query",
+        "_loader"
     )
 
     def __init__(self, query, id_: int, title: str, tracks_count: int,
-                 duration: int, modified: str, tracks: list):
+                 duration: int, modified: str, tracks: list = None,
+                 loader=None):
         self.id_ = id_
         self.title = title
-        self.tracks = tracks
         self.tracks_count = tracks_count
         self.duration_ms = duration
         self.duration = Playlist._format_ms(self.duration_ms)
         self.modified = Playlist._utc_to_local(modified) \
             if modified else None
 
+        self._tracks = tracks
         self._query = query
+        self._loader = loader
+
+    @property
+    def tracks(self):
+        if self._tracks is None:
+            self._tracks = self._loader.get_tracks(self)
+        return self._tracks
+
+    @tracks.setter
+    def tracks(self, value):
+        self._tracks = value
 
     def get_artists_counter(self):
         """Get a dict with {Artist name: count} items."""
         return self._query.get_artists_counter(self.id_)
 
+    def get_artists_likes(self):
+        """Get a dict with {Artist name: likes count} items.
+
+        Only the stale likes are requested, concurrently.
+        """
+        return self._loader.get_artists_likes(self.tracks)
+
     def get_genres_counter(self):
         """Get a dict with {Genre: count} items."""
         return self._query.get_genres_counter(self.id_)
@@ -134,12 +228,15 @@ class Playlist:
         return date_utc.replace(tzinfo=timezone.utc).astimezone()
 
     def __str__(self):
-        return f"Playlist({self.title}, {len(self.tracks)} track(s))"
+        return f"Playlist({self.title}, {self.tracks_count} track(s))"
 
 
 class Track:
     """A track's data storing class.
 
+    The artists, if not given, are loaded by the loader on the first
+    access.
+
     Args:
         id_: the track's real id
         title: the track's title
@@ -148,6 +245,7 @@ class Track:
         year: the track's release year
         genre: the track's genre
         duration: duration of the track
+        loader: Loader object for the lazy loading of the artists
 
     Attributes:
         id_:
@@ -163,25 +261,49 @@ class Track:
     __slots__ = (
         "id_",
         "title",
-        "artists",
-        "artists_count",
         "year",
         "genre",
         "duration_ms",
-        "duration"
+        "duration",
+        "_artists",
+        "_artists_count",
+        "_loader"
     )
 
     def __init__(self, id_: int, title: str, year: int, genre: str,
-                 duration: int, artists: list, artists_count: int):
+                 duration: int, artists: list = None,
+                 artists_count: int = None, loader=None):
         self.id_ = id_
         self.title = title
-        self.artists = artists
-        self.artists_count = artists_count
         self.year = year
         self.genre = genre
         self.duration_ms = duration
         self.duration = Track._format_ms(self.duration_ms)
 
+        self._artists = artists
+        self._artists_count = artists_count
+        self._loader = loader
+
+    @property
+    def artists(self):
+        if self._artists is None:
+            self._artists = self._loader.get_artists(self)
+        return self._artists
+
+    @artists.setter
+    def artists(self, value):
+        self._artists = value
+
+    @property
+    def artists_count(self):
+        if self._artists_count is None:
+            self._artists_count = len(self.artists)
+        return self._artists_count
+
+    @artists_count.setter
+    def artists_count(self, value):
+        self._artists_count = value
+
     @staticmethod
     def _format_ms(total_ms: int) -> str:
         """Format milliseconds to the string.
@@ -207,6 +329,7 @@ class User:
         login: the user's login
         playlists: a list of the user's playlists
         playlists_count: the user's playlists count
+        loader: Loader object for the artists' likes
 
     Attributes:
         login:
@@ -220,17 +343,19 @@ class User:
         "name",
         "playlists",
         "playlists_count",
-        "_query"
+        "_query",
+        "_loader"
     )
 
     def __init__(self, query, login: str, playlists_count: int,
-                 playlists: list):
+                 playlists: list, loader=None):
         self.login = login
         self.name = query.user_name
         self.playlists = playlists
         self.playlists_count = playlists_count
 
         self._query = query
+        self._loader = loader
 
     def delete(self):
         """Delete all the user's data from the database."""
@@ -240,6 +365,56 @@ class User:
         else:
             flash(msg="DEL_ALREADY", login=self.login)
 
+    def get_artists_counter(self):
+        """Get a dict with {Artist name: count} items of all the playlists.
+
+        A track of several playlists is counted once.
+        """
+        return self._query.get_user_artists_counter()
+
+    def get_artists_likes(self):
+        """Get a dict with {Artist name: likes count} items.
+
+        All the playlists' artists are included, only the stale likes
+        are requested, concurrently.
+        """
+        return self._loader.get_artists_likes(
+            [j for i in self.playlists for j in i.tracks]
+        )
+
+    def get_genres_counter(self):
+        """Get a dict with {Genre: count} items of all the playlists.
+
+        A track of several playlists is counted once.
+        """
+        return self._query.get_user_genres_counter()
+
+    def search_artists(self, text: str, limit: int = 20) -> list:
+        """Find the user's artists by the name.
+
+        Every word of the text matches a word's beginning, the best
+        matches go first.
+
+        :param text: a search text
+        :param limit: the maximum number of the artists
+        :return: a list of Artist objects
+        """
+        return self._loader.search_artists(text, limit)
+
+    def search_tracks(self, text: str, playlist_id: int = None,
+                      limit: int = 20) -> list:
+        """Find the user's tracks by the title and the artists' names.
+
+        Every word of the text matches a word's beginning, the best
+        matches go first.
+
+        :param text: a search text
+        :param playlist_id: the playlist's id, all the tracks by default
+        :param limit: the maximum number of the tracks
+        :return: a list of Track objects
+        """
+        return self._loader.search_tracks(text, playlist_id, limit)
+
     def __str__(self):
         return (
             f"User {self.login}({self.name}, "
@@ -1,6 +1,16 @@
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
 from json import loads
+from time import perf_counter, time
 
-from urllib3 import PoolManager
+from urllib3 import PoolManager, Retry, Timeout
+from urllib3.exceptions import MaxRetryError
+from urllib3.util import make_headers, parse_url
+
+from .cache import ResponseCache
+from .scheduler import Scheduler
+from .stats import Stats
+from .stream import iter_array
 
 BASE_URL = "https://music.yandex.ru/handlers"
 URLS = {
@@ -9,22 +19,178 @@ URLS = {
     "playlist": f"{BASE_URL}" "/playlist.jsx?owner={}&kinds={}",
     "artist": f"{BASE_URL}" "/artist.jsx?artist={}",
 }
+PRIORITIES = {
+    "info": 0,
+    "playlists": 0,
+    "playlist": 1,
+    "artist": 2,
+}
 HEADERS = {
     "Referer": "https://music.yandex.ru/",
+    **make_headers(accept_encoding=True),
 }
+RETRY_STATUSES = (500, 502, 503, 504)
+NOT_MODIFIED = 304
+TOO_MANY_REQUESTS = 429
+CHUNK_SIZE = 64 * 1024
 
 
 class Connection:
-    """Connect to the Yandex Music site and download response."""
+    """Connect to the Yandex Music site and download response.
+
+    One Connection object keeps a pool of alive connections, so it should
+    be created once and shared by everything that makes requests.
+
+    All the requests go through a Scheduler. When the site answers "429
+    Too Many Requests", the host is paused for the Retry-After time (or
+    an exponential delay) and the request is repeated.
 
-    def __init__(self):
-        self.__http = PoolManager()
+    With a ResponseCache, stored responses are revalidated by conditional
+    requests and taken from the cache when the site answers "304 Not
+    Modified".
+
+    Args:
+        pool_size: the maximum number of kept connections to the site
+        connect_timeout: a timeout for establishing a connection, in seconds
+        read_timeout: a timeout for reading a response, in seconds
+        retries: the number of retries on failed requests
+        backoff_factor: a base of the exponential delay between retries
+        scheduler: Scheduler object, may be shared by several connections
+        cache: ResponseCache object, responses aren't cached by default
+        base_url: a replacement of BASE_URL, e.g. a local server's one
+        stats: Stats object counting the requests
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 5.0,
+                 read_timeout: float = 30.0, retries: int = 3,
+                 backoff_factor: float = 0.5, scheduler: Scheduler = None,
+                 cache: ResponseCache = None, base_url: str = None,
+                 stats: Stats = None):
+        self.__http = PoolManager(
+            maxsize=pool_size,
+            headers=HEADERS,
+            timeout=Timeout(connect=connect_timeout, read=read_timeout),
+            retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUSES,
+                # "429 Too Many Requests" is handled by the scheduler.
+                respect_retry_after_header=False,
+            ),
+        )
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+        self._scheduler = scheduler or Scheduler(max_in_flight=pool_size)
+        self._cache = cache
+        self._base_url = base_url
+        self._stats = stats
 
     def get_json(self, subject, *args):
         """Get response in the JSON format."""
-        return loads(self._response(subject, *args))
+        url = self._get_url(subject, *args)
+        cached = self._cache.get(url) if self._cache else None
+
+        status, headers, body = self._response(
+            subject, url, cached[0] if cached else None
+        )
+        if cached and status == NOT_MODIFIED:
+            return loads(cached[1])
+
+        if self._cache:
+            self._cache.put(url, headers, body)
+
+        return loads(body)
+
+    def iter_json(self, subject, *args, key: str):
+        """Get items of a JSON array from the response one by one.
+
+        The response is decoded while it is being downloaded and isn't
+        cached, so the memory usage doesn't depend on the array's size.
+
+        :param subject: a key of the URLS dict
+        :param args: the URL arguments
+        :param key: the array member's name
+        :return: a generator of the array's items
+        """
+        url = self._get_url(subject, *args)
+
+        with self._request(subject, url) as response:
+            yield from iter_array(response.stream(CHUNK_SIZE), key)
+
+    @contextmanager
+    def _request(self, subject, url, headers=None):
+        """Send a request to the Yandex Music site.
 
-    def _response(self, subject, *args):
-        """Get response from the Yandex Music site."""
+        The response's connection is returned to the pool at the end of
+        the block.
+        """
+        host = parse_url(url).host
+        priority = PRIORITIES.get(subject, max(PRIORITIES.values()))
+
+        for attempt in range(self._retries + 1):
+            with self._scheduler.slot(host, priority):
+                start = perf_counter()
+                response = self.__http.request(
+                    "GET",
+                    url,
+                    headers={**HEADERS, **(headers or {})},
+                    preload_content=False,
+                )
+                elapsed = perf_counter() - start
+
+                try:
+                    if response.status != TOO_MANY_REQUESTS:
+                        yield response
+                        return
+
+                    delay = self._get_retry_after(response, attempt)
+                    response.drain_conn()
+                finally:
+                    if self._stats:
+                        self._stats.add_request(
+                            url, response.status, response.tell(), elapsed
+                        )
+                    response.release_conn()
+
+            self._scheduler.back_off(host, delay)
+
+        raise MaxRetryError(None, url, "Too many requests")
+
+    def _response(self, subject, url, headers=None):
+        """Get response from the Yandex Music site.
+
+        The body is read by chunks, so a compressed response is decoded
+        on the fly.
+
+        :return: a tuple with the status, the headers and the body
+        """
+        with self._request(subject, url, headers) as response:
+            return (
+                response.status,
+                response.headers,
+                b"".join(response.stream(CHUNK_SIZE)),
+            )
+
+    def _get_retry_after(self, response, attempt):
+        """Get a delay before the next attempt in seconds."""
+        value = response.getheader("Retry-After")
+
+        if value:
+            if value.strip().isdigit():
+                return int(value)
+
+            try:
+                return max(
+                    parsedate_to_datetime(value).timestamp() - time(), 0
+                )
+            except (TypeError, ValueError):
+                pass
+
+        return self._backoff_factor * 2 ** attempt
+
+    def _get_url(self, subject, *args):
         url = URLS[subject].format(*args)
-        return self.__http.request("GET", url, headers=HEADERS).data
+        if self._base_url:
+            url = self._base_url + url[len(BASE_URL):]
+
+        return url
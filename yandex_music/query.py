@@ -1,28 +1,58 @@
+import re
+
 from .database import DataCtx
+from .schema import migrate
+
+# The number of ids bound to one statement, SQLite before 3.32 allows
+# 999 variables at most.
+CHUNK_SIZE = 500
 
 
 class BaseQuery:
-    """Queries executing class."""
+    """Queries executing class.
+
+    Args:
+        login: the user's login
+        db: DataCtx object shared with other queries, a new one by default
+    """
 
-    def __init__(self, login: str):
-        self._db = DataCtx()
+    def __init__(self, login: str, db: DataCtx = None):
+        self._db = db or DataCtx()
         self._init_tables()
 
         self.user_name, self._uid = self._get_user_data(login)
 
     def delete_unused(self):
-        self._delete_unused_tracks()
-        self._delete_unused_artists()
+        """Delete the tracks and artists which aren't in any playlist.
+
+        :return: the number of deleted rows
+        """
+        return self._delete_unused_tracks() + self._delete_unused_artists()
+
+    def get_revision(self) -> tuple:
+        """Get the database's revision increased by every sync.
+
+        :return: a tuple with the database's unique id and the revision
+        """
+        return self._db.select("select database_id, value from revision")
+
+    def transaction(self):
+        """Get a context manager executing the queries in one transaction."""
+        return self._db.transaction()
+
+    def update_revision(self):
+        """Increase the database's revision."""
+        self._db.execute("update revision set value = value + 1")
 
     def _delete_unused_artists(self):
-        self._db.execute(
+        return self._db.execute(
             """delete from artist
                where id not in (
                  select artist_id from artist_track)"""
         )
 
     def _delete_unused_tracks(self):
-        self._db.execute(
+        return self._db.execute(
             """delete from track
                where id not in (
                  select track_id from playlist_track)"""
@@ -35,55 +65,7 @@ class BaseQuery:
         return data if data else (None, None)
 
     def _init_tables(self):
-        self._db.execute_script(
-            """PRAGMA foreign_keys = on;
-
-            create table if not exists user (
-                id integer primary key,
-                login text unique not null,
-                name text not null,
-                playlists_count integer);
-
-            create table if not exists playlist (
-                user_id integer,
-                id integer,
-                title text not null,
-                tracks_count integer,
-                duration integer,
-                modified text,
-                primary key (user_id, id),
-                foreign key (user_id) references user(id) on delete cascade);
-
-            create table if not exists track (
-                id integer primary key,
-                title text not null,
-                year integer,
-                genre text,
-                duration integer);
-
-            create table if not exists artist (
-                id integer primary key,
-                name text not null);
-
-            create table if not exists playlist_track (
-                user_id integer,
-                playlist_id integer,
-                track_id integer,
-                primary key (user_id, playlist_id, track_id)
-                foreign key (user_id, playlist_id) references
-                  playlist(user_id, id) on delete cascade,
-                foreign key (track_id) references track(id)
-                  on delete cascade);
-
-            create table if not exists artist_track (
-                artist_id integer,
-                track_id integer,
-                primary key (artist_id, track_id),
-                foreign key (artist_id) references artist(id)
-                  on delete cascade,
-                foreign key (track_id) references track(id)
-                  on delete cascade);"""
-        )
+        migrate(self._db)
 
 
 class Query(BaseQuery):
@@ -110,38 +92,36 @@ class Query(BaseQuery):
                    where artist_id = ?"""
         return [i[0] for i in self._db.select_all(query, (_id,))]
 
-    def get_artist_track_ids(self):
-        return self._db.select_all("select * from artist_track")
-
-    def get_artist_tracks_ids(self, playlist_id, artist_id):
-        query = """select at.track_id
-                   from artist_track at
-                     inner join playlist_track pt on pt.track_id = at.track_id
-                   where pt.user_id = ? and pt.playlist_id = ?
-                     and at.artist_id = ?"""
-        return [
-            i[0] for i in self._db.select_all(
-                query, (self._uid, playlist_id, artist_id,)
+    def get_artist_tracks(self, artist_id):
+        query = """select t.*
+                   from track t
+                     inner join artist_track at on at.track_id = t.id
+                   where at.artist_id = ? and t.id in (
+                     select track_id from playlist_track where user_id = ?)"""
+        return self._db.select_all(query, (artist_id, self._uid,))
+
+    def get_artists_likes(self, ids, fetched_after: float):
+        likes = {}
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            signs = ", ".join(["?"] * len(chunk))
+            likes.update(
+                self._db.select_all(
+                    f"""select artist_id, likes from artist_likes
+                        where artist_id in ({signs}) and fetched > ?""",
+                    (*chunk, fetched_after)
+                )
             )
-        ]
 
-    def get_artists_ids(self):
-        return self._get_ids("artist")
+        return likes
 
-    def get_modified(self, _id: int):
-        return self._db.select(
-            """select modified from playlist
-               where user_id = ? and id = ?""",
-            (self._uid, _id)
-        )[0]
-
-    def get_playlist_artists(self, _id):
-        query = """select distinct a.*
-                   from artist a
-                     inner join artist_track at on at.artist_id = a.id
-                     inner join playlist_track pt on pt.track_id = at.track_id
-                   where playlist_id = ? and user_id = ?"""
-        return self._db.select_all(query, (_id, self._uid,))
+    def get_fingerprints(self):
+        return {
+            i: j for i, j in self._db.select_all(
+                "select id, fingerprint from playlist where user_id = ?",
+                (self._uid,)
+            )
+        }
 
     def get_playlist_title(self, _id: int):
         return self._db.select(
@@ -173,27 +153,75 @@ class Query(BaseQuery):
             )
         ]
 
-    def get_track_artists_ids(self, _id):
-        query = """select artist_id
+    def get_track_artists(self, _id):
+        query = """select a.*
+                   from artist a
+                     inner join artist_track at on at.artist_id = a.id
+                   where at.track_id = ?"""
+        return self._db.select_all(query, (_id,))
+
+    def get_user_artist_track(self):
+        query = """select artist_id, track_id
                    from artist_track
-                   where track_id = ?"""
-        return [i[0] for i in self._db.select_all(query, (_id,))]
+                   where track_id in (
+                     select track_id from playlist_track where user_id = ?)"""
+        return self._db.select_all(query, (self._uid,))
 
-    def get_tracks_ids(self):
-        return self._get_ids("track")
+    def get_user_artists(self):
+        query = """select *
+                   from artist
+                   where id in (
+                     select artist_id
+                     from artist_track
+                     where track_id in (
+                       select track_id from playlist_track
+                       where user_id = ?))"""
+        return self._db.select_all(query, (self._uid,))
+
+    def get_user_artists_genres(self):
+        query = """select distinct at.artist_id, t.genre
+                   from artist_track at
+                     inner join track t on t.id = at.track_id
+                   where at.artist_id in (
+                     select artist_id
+                     from artist_track
+                     where track_id in (
+                       select track_id from playlist_track
+                       where user_id = ?))"""
+        return self._db.select_all(query, (self._uid,))
+
+    def get_user_playlist_track(self):
+        query = """select playlist_id, track_id
+                   from playlist_track
+                   where user_id = ?"""
+        return self._db.select_all(query, (self._uid,))
 
     def get_user_playlists(self):
         query = """select id, title, tracks_count, duration, modified
                    from playlist where user_id = ?"""
         return self._db.select_all(query, (self._uid,))
 
+    def get_user_tracks(self):
+        query = """select *
+                   from track
+                   where id in (
+                     select track_id from playlist_track where user_id = ?)"""
+        return self._db.select_all(query, (self._uid,))
+
     def insert_artist_track(self, params: list):
         self._db.execute_many(
-            "insert into artist_track values (?, ?)", params
+            "insert or ignore into artist_track values (?, ?)", params
         )
 
     def insert_artists(self, params: list):
-        self._db.execute_many("insert into artist values (?, ?)", params)
+        self._db.execute_many(
+            "insert or ignore into artist values (?, ?)", params
+        )
+
+    def insert_artists_likes(self, params: list):
+        self._db.execute_many(
+            "insert or replace into artist_likes values (?, ?, ?)", params
+        )
 
     def insert_playlist_tracks(self, params: list):
         params = self._get_params_with_uid(params)
@@ -204,12 +232,15 @@ class Query(BaseQuery):
     def insert_playlists(self, params: list):
         params = self._get_params_with_uid(params)
         self._db.execute_many(
-            "insert into playlist values (?, ?, ?, ?, ?, ?)", params
+            """insert into playlist (user_id, id, title, tracks_count,
+                 duration, modified, fingerprint)
+               values (?, ?, ?, ?, ?, ?, ?)""",
+            params
         )
 
     def insert_tracks(self, params: list):
         self._db.execute_many(
-            "insert into track values (?, ?, ?, ?, ?)", params
+            "insert or ignore into track values (?, ?, ?, ?, ?)", params
         )
 
     def insert_user(self, *params):
@@ -218,6 +249,94 @@ class Query(BaseQuery):
         )
         self._uid = params[0]
 
+    def search_artists(self, text: str, limit: int):
+        words = re.findall(r"\w+", text)
+        if not words:
+            return []
+
+        # The unary plus makes the user's rows be looked up by the tracks.
+        scope = """exists (
+                     select 1
+                     from artist_track at
+                       inner join playlist_track pt
+                         on pt.track_id = at.track_id
+                     where at.artist_id = a.id and +pt.user_id = ?)"""
+
+        if self._has_search():
+            query = f"""select a.*
+                        from artist_search s
+                          inner join artist a on a.id = s.rowid
+                        where artist_search match ? and {scope}
+                        order by s.rank
+                        limit ?"""
+            params = (_get_match(words), self._uid, limit)
+        else:
+            conditions = " and ".join(["a.name like ?"] * len(words))
+            query = f"""select a.*
+                        from artist a
+                        where {conditions} and {scope}
+                        order by a.name
+                        limit ?"""
+            params = (*[f"%{i}%" for i in words], self._uid, limit)
+
+        return self._db.select_all(query, params)
+
+    def search_tracks(self, text: str, playlist_id: int, limit: int):
+        words = re.findall(r"\w+", text)
+        if not words:
+            return []
+
+        # The unary plus makes the user's rows be looked up by the track
+        # unless the whole primary key is known.
+        scope = """exists (
+                     select 1 from playlist_track pt
+                     where pt.track_id = t.id and {}pt.user_id = ?"""
+        scope_params = [self._uid]
+        if playlist_id is None:
+            scope = scope.format("+")
+        else:
+            scope = scope.format("") + " and pt.playlist_id = ?"
+            scope_params.append(playlist_id)
+        scope += ")"
+
+        if self._has_search():
+            query = f"""select t.*
+                        from track_search s
+                          inner join track t on t.id = s.rowid
+                        where track_search match ? and {scope}
+                        order by s.rank
+                        limit ?"""
+            params = (_get_match(words), *scope_params, limit)
+        else:
+            conditions = " and ".join(
+                [
+                    """(t.title like ? or exists (
+                         select 1
+                         from artist_track at
+                           inner join artist a on a.id = at.artist_id
+                         where at.track_id = t.id and a.name like ?))"""
+                ] * len(words)
+            )
+            query = f"""select t.*
+                        from track t
+                        where {conditions} and {scope}
+                        order by t.title
+                        limit ?"""
+            params = (
+                *[f"%{i}%" for i in words for _ in range(2)],
+                *scope_params,
+                limit
+            )
+
+        return self._db.select_all(query, params)
+
+    def update_fingerprint(self, _id: int, fingerprint: str):
+        self._db.execute(
+            """update playlist set fingerprint = ?
+               where user_id = ? and id = ?""",
+            (fingerprint, self._uid, _id)
+        )
+
     def update_modified(self, _id: int, modified: str):
         self._db.execute(
             """update playlist set modified = ?
@@ -258,18 +377,92 @@ class Query(BaseQuery):
             (self._uid, _id, self._uid, _id)
         )
 
-    def _get_ids(self, table: str):
-        return [i[0] for i in self._db.select_all(f"select id from {table}")]
-
     def _get_params_with_uid(self, params: list):
         return [tuple([self._uid, *i]) for i in params]
 
+    def _has_search(self):
+        """Check if the full-text search indexes exist."""
+        return bool(
+            self._db.select(
+                """select count(*) from sqlite_master
+                   where type = 'table' and name = 'track_search'"""
+            )[0]
+        )
+
 
 class UserQuery(BaseQuery):
+    def check_counters(self, rebuild: bool = False) -> bool:
+        """Check the user's and the playlists' counters against the tracks.
+
+        The counters are kept by the triggers on the playlists' tracks,
+        they may differ only if the tables were changed bypassing them.
+
+        :param rebuild: count the counters again if they differ
+        :return: True if the counters were correct
+        """
+        checks = (
+            (
+                """select playlist_id, artist_id, count
+                   from playlist_artist_count where user_id = ?""",
+                """select pt.playlist_id, at.artist_id, count(*)
+                   from playlist_track pt
+                     inner join artist_track at on at.track_id = pt.track_id
+                   where pt.user_id = ?
+                   group by pt.playlist_id, at.artist_id""",
+            ),
+            (
+                """select playlist_id, genre, count
+                   from playlist_genre_count where user_id = ?""",
+                """select pt.playlist_id, t.genre, count(*)
+                   from playlist_track pt
+                     inner join track t on t.id = pt.track_id
+                   where pt.user_id = ? and t.genre is not null
+                   group by pt.playlist_id, t.genre""",
+            ),
+            (
+                """select track_id, count
+                   from user_track where user_id = ?""",
+                """select track_id, count(*)
+                   from playlist_track
+                   where user_id = ?
+                   group by track_id""",
+            ),
+            (
+                """select artist_id, count
+                   from user_artist_count where user_id = ?""",
+                """select at.artist_id, count(distinct pt.track_id)
+                   from playlist_track pt
+                     inner join artist_track at on at.track_id = pt.track_id
+                   where pt.user_id = ?
+                   group by at.artist_id""",
+            ),
+            (
+                """select genre, count
+                   from user_genre_count where user_id = ?""",
+                """select t.genre, count(distinct pt.track_id)
+                   from playlist_track pt
+                     inner join track t on t.id = pt.track_id
+                   where pt.user_id = ? and t.genre is not null
+                   group by t.genre""",
+            ),
+        )
+        correct = all(
+            set(self._db.select_all(stored, (self._uid,)))
+            == set(self._db.select_all(actual, (self._uid,)))
+            for stored, actual in checks
+        )
+
+        if not correct and rebuild:
+            self._rebuild_counters()
+
+        return correct
+
     def delete_user_data(self):
-        self._db.execute("delete from user where id = ?", (self._uid,))
+        with self.transaction():
+            self._db.execute("delete from user where id = ?", (self._uid,))
 
-        self.delete_unused()
+            self.delete_unused()
+            self.update_revision()
 
         self.user_name = None
 
@@ -286,27 +479,87 @@ class UserQuery(BaseQuery):
         return self._db.select_all(query, (self._uid, genre))
 
     def get_artists_counter(self, playlist_id):
-        query = """select a.name, count(*) as col
-                   from artist a
-                     inner join artist_track at on at.artist_id = a.id
-                     inner join playlist_track pt on pt.track_id = at.track_id
-                   where pt.playlist_id = ? and pt.user_id = ?
+        query = """select a.name, sum(c.count) as col
+                   from playlist_artist_count c
+                     inner join artist a on a.id = c.artist_id
+                   where c.user_id = ? and c.playlist_id = ?
                    group by a.name
                    order by col desc, a.name"""
-        return {
-            i: j
-            for i, j in self._db.select_all(query, (playlist_id, self._uid,))
-        }
+        return self._get_counter(query, (self._uid, playlist_id))
 
     def get_genres_counter(self, playlist_id):
-        query = """select genre, count(*) as col
-                   from track
-                     inner join playlist_track on track_id = id
-                   where genre is not null and playlist_id = ?
-                     and user_id = ?
-                   group by genre
-                   order by col desc, genre"""
-        return {
-            i: j
-            for i, j in self._db.select_all(query, (playlist_id, self._uid,))
-        }
+        query = """select genre, count
+                   from playlist_genre_count
+                   where user_id = ? and playlist_id = ?
+                   order by count desc, genre"""
+        return self._get_counter(query, (self._uid, playlist_id))
+
+    def get_user_artists_counter(self):
+        query = """select a.name, sum(c.count) as col
+                   from user_artist_count c
+                     inner join artist a on a.id = c.artist_id
+                   where c.user_id = ?
+                   group by a.name
+                   order by col desc, a.name"""
+        return self._get_counter(query, (self._uid,))
+
+    def get_user_genres_counter(self):
+        query = """select genre, count
+                   from user_genre_count
+                   where user_id = ?
+                   order by count desc, genre"""
+        return self._get_counter(query, (self._uid,))
+
+    def _get_counter(self, query, params):
+        return {i: j for i, j in self._db.select_all(query, params)}
+
+    def _rebuild_counters(self):
+        with self.transaction():
+            self._db.execute(
+                "delete from playlist_artist_count where user_id = ?",
+                (self._uid,)
+            )
+            self._db.execute(
+                "delete from playlist_genre_count where user_id = ?",
+                (self._uid,)
+            )
+            self._db.execute(
+                """insert into playlist_artist_count
+                   select pt.user_id, pt.playlist_id, at.artist_id, count(*)
+                   from playlist_track pt
+                     inner join artist_track at on at.track_id = pt.track_id
+                   where pt.user_id = ?
+                   group by pt.playlist_id, at.artist_id""",
+                (self._uid,)
+            )
+            self._db.execute(
+                """insert into playlist_genre_count
+                   select pt.user_id, pt.playlist_id, t.genre, count(*)
+                   from playlist_track pt
+                     inner join track t on t.id = pt.track_id
+                   where pt.user_id = ? and t.genre is not null
+                   group by pt.playlist_id, t.genre""",
+                (self._uid,)
+            )
+
+            # The user's counters are counted again by the triggers of
+            # the user's tracks.
+            for table in (
+                "user_track", "user_artist_count", "user_genre_count"
+            ):
+                self._db.execute(
+                    f"delete from {table} where user_id = ?", (self._uid,)
+                )
+            self._db.execute(
+                """insert into user_track
+                   select user_id, track_id, count(*)
+                   from playlist_track
+                   where user_id = ?
+                   group by track_id""",
+                (self._uid,)
+            )
+
+
+def _get_match(words: list) -> str:
+    """Get a full-text search query matching all the words' prefixes."""
+    return " ".join(f'"{i}"*' for i in words)
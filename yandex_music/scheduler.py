@@ -0,0 +1,126 @@
+import heapq
+from contextlib import contextmanager
+from itertools import count
+from threading import Condition
+from time import monotonic
+
+
+class Scheduler:
+    """Requests scheduling class.
+
+    Every host has a token bucket limiting the requests rate and a queue
+    of waiting requests ordered by priority (lower value goes first). The
+    total number of requests in flight is limited for all the hosts.
+
+    Args:
+        rate: the number of requests per second allowed for a host
+        burst: the maximum number of requests sent to a host at once
+        max_in_flight: the maximum number of simultaneous requests
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 10,
+                 max_in_flight: int = 8):
+        self._rate = rate
+        self._burst = burst
+        self._max_in_flight = max_in_flight
+
+        self._cond = Condition()
+        self._hosts = {}
+        self._in_flight = 0
+        self._order = count()
+
+    @contextmanager
+    def slot(self, host: str, priority: int = 0):
+        """Wait for a permission to send a request to the host.
+
+        :param host: the request's host
+        :param priority: the request's priority, lower goes first
+        """
+        self._acquire(host, priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def back_off(self, host: str, delay: float):
+        """Stop sending requests to the host for a while.
+
+        :param host: the host which asked to slow down
+        :param delay: a pause in seconds
+        """
+        with self._cond:
+            bucket = self._get_bucket(host)
+            bucket.paused_until = max(
+                bucket.paused_until, monotonic() + delay
+            )
+            bucket.tokens = 0.0
+            bucket.updated = bucket.paused_until
+            self._cond.notify_all()
+
+    def _acquire(self, host, priority):
+        with self._cond:
+            bucket = self._get_bucket(host)
+            entry = (priority, next(self._order))
+            heapq.heappush(bucket.queue, entry)
+
+            try:
+                delay = self._get_delay(bucket, entry)
+                while delay != 0:
+                    self._cond.wait(delay)
+                    delay = self._get_delay(bucket, entry)
+            except BaseException:
+                bucket.queue.remove(entry)
+                heapq.heapify(bucket.queue)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(bucket.queue)
+            bucket.tokens -= 1
+            self._in_flight += 1
+            self._cond.notify_all()
+
+    def _get_bucket(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = _Bucket(self._burst)
+        return self._hosts[host]
+
+    def _get_delay(self, bucket, entry):
+        """Get seconds to wait before the request can be sent.
+
+        None means waiting until another request changes the state.
+        """
+        if bucket.queue[0] != entry \
+                or self._in_flight >= self._max_in_flight:
+            return None
+
+        now = monotonic()
+        if now < bucket.paused_until:
+            return bucket.paused_until - now
+
+        bucket.tokens = min(
+            self._burst,
+            bucket.tokens + (now - bucket.updated) * self._rate
+        )
+        bucket.updated = now
+
+        if bucket.tokens >= 1:
+            return 0
+
+        return (1 - bucket.tokens) / self._rate
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+
+class _Bucket:
+    """A host's token bucket and queue."""
+
+    __slots__ = ("tokens", "updated", "paused_until", "queue")
+
+    def __init__(self, tokens: float):
+        self.tokens = tokens
+        self.updated = monotonic()
+        self.paused_until = 0.0
+        self.queue = []
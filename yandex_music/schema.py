@@ -0,0 +1,377 @@
+"""The database schema migrations.
+
+Every migration is a SQL script bringing the schema to the next version.
+The current version is kept in the `user_version` pragma, so only the
+new migrations are applied to an existing database. Existing migrations
+must never be changed, new ones are appended to the end.
+
+A migration depending on an optional SQLite module is a tuple of the
+script and the fallback script applied if the module is missing.
+
+The schema of a database file is checked once per process.
+"""
+from sqlite3 import OperationalError
+from threading import Lock
+
+from .exceptions import ReadOnlyError
+
+MIGRATIONS = (
+    # 1: the initial tables
+    """create table if not exists user (
+        id integer primary key,
+        login text unique not null,
+        name text not null,
+        playlists_count integer);
+
+    create table if not exists playlist (
+        user_id integer,
+        id integer,
+        title text not null,
+        tracks_count integer,
+        duration integer,
+        modified text,
+        primary key (user_id, id),
+        foreign key (user_id) references user(id) on delete cascade);
+
+    create table if not exists track (
+        id integer primary key,
+        title text not null,
+        year integer,
+        genre text,
+        duration integer);
+
+    create table if not exists artist (
+        id integer primary key,
+        name text not null);
+
+    create table if not exists playlist_track (
+        user_id integer,
+        playlist_id integer,
+        track_id integer,
+        primary key (user_id, playlist_id, track_id)
+        foreign key (user_id, playlist_id) references
+          playlist(user_id, id) on delete cascade,
+        foreign key (track_id) references track(id)
+          on delete cascade);
+
+    create table if not exists artist_track (
+        artist_id integer,
+        track_id integer,
+        primary key (artist_id, track_id),
+        foreign key (artist_id) references artist(id)
+          on delete cascade,
+        foreign key (track_id) references track(id)
+          on delete cascade);""",
+    # 2: the secondary indexes for the lookups by track and genre
+    """create index if not exists artist_track_track_id
+        on artist_track(track_id);
+
+    create index if not exists playlist_track_track_id
+        on playlist_track(track_id);
+
+    create index if not exists track_genre on track(genre);""",
+    # 3: the playlists' fingerprints for the change detection
+    """alter table playlist add column fingerprint text;""",
+    # 4: the artists' likes with the time of the request
+    """create table if not exists artist_likes (
+        artist_id integer primary key,
+        likes integer not null,
+        fetched real not null,
+        foreign key (artist_id) references artist(id)
+          on delete cascade);""",
+    # 5: the playlists' artists and genres counters kept by the triggers
+    """create table if not exists playlist_artist_count (
+        user_id integer,
+        playlist_id integer,
+        artist_id integer,
+        count integer not null,
+        primary key (user_id, playlist_id, artist_id),
+        foreign key (user_id, playlist_id) references
+          playlist(user_id, id) on delete cascade);
+
+    create table if not exists playlist_genre_count (
+        user_id integer,
+        playlist_id integer,
+        genre text,
+        count integer not null,
+        primary key (user_id, playlist_id, genre),
+        foreign key (user_id, playlist_id) references
+          playlist(user_id, id) on delete cascade);
+
+    create trigger if not exists playlist_track_insert
+    after insert on playlist_track
+    begin
+        insert into playlist_artist_count
+          select new.user_id, new.playlist_id, artist_id, 1
+          from artist_track
+          where track_id = new.track_id
+        on conflict (user_id, playlist_id, artist_id)
+          do update set count = count + 1;
+
+        insert into playlist_genre_count
+          select new.user_id, new.playlist_id, genre, 1
+          from track
+          where id = new.track_id and genre is not null
+        on conflict (user_id, playlist_id, genre)
+          do update set count = count + 1;
+    end;
+
+    create trigger if not exists playlist_track_delete
+    after delete on playlist_track
+    begin
+        update playlist_artist_count set count = count - 1
+        where user_id = old.user_id and playlist_id = old.playlist_id
+          and artist_id in (
+            select artist_id from artist_track
+            where track_id = old.track_id);
+
+        update playlist_genre_count set count = count - 1
+        where user_id = old.user_id and playlist_id = old.playlist_id
+          and genre = (select genre from track where id = old.track_id);
+
+        delete from playlist_artist_count
+        where user_id = old.user_id and playlist_id = old.playlist_id
+          and artist_id in (
+            select artist_id from artist_track
+            where track_id = old.track_id)
+          and count < 1;
+
+        delete from playlist_genre_count
+        where user_id = old.user_id and playlist_id = old.playlist_id
+          and genre = (select genre from track where id = old.track_id)
+          and count < 1;
+    end;
+
+    insert into playlist_artist_count
+      select pt.user_id, pt.playlist_id, at.artist_id, count(*)
+      from playlist_track pt
+        inner join artist_track at on at.track_id = pt.track_id
+      group by pt.user_id, pt.playlist_id, at.artist_id;
+
+    insert into playlist_genre_count
+      select pt.user_id, pt.playlist_id, t.genre, count(*)
+      from playlist_track pt
+        inner join track t on t.id = pt.track_id
+      where t.genre is not null
+      group by pt.user_id, pt.playlist_id, t.genre;""",
+    # 6: the covering index for the lookups of the tracks' artists
+    """drop index if exists artist_track_track_id;
+
+    create index if not exists artist_track_track_artist
+        on artist_track(track_id, artist_id);""",
+    # 7: the full-text search indexes of the tracks and artists, the
+    # tracks are searched by the titles and the artists' names
+    (
+        """create virtual table if not exists track_search
+            using fts5(title, artists, prefix='2 3');
+
+        create virtual table if not exists artist_search
+            using fts5(
+              name, content='artist', content_rowid='id', prefix='2 3');
+
+        create trigger if not exists track_search_insert
+        after insert on track
+        begin
+            insert into track_search (rowid, title, artists)
+            values (new.id, new.title, '');
+        end;
+
+        create trigger if not exists track_search_delete
+        after delete on track
+        begin
+            delete from track_search where rowid = old.id;
+        end;
+
+        create trigger if not exists track_search_artist
+        after insert on artist_track
+        begin
+            update track_search
+            set artists = artists || ' ' || (
+              select name from artist where id = new.artist_id)
+            where rowid = new.track_id;
+        end;
+
+        create trigger if not exists artist_search_insert
+        after insert on artist
+        begin
+            insert into artist_search (rowid, name)
+            values (new.id, new.name);
+        end;
+
+        create trigger if not exists artist_search_delete
+        after delete on artist
+        begin
+            insert into artist_search (artist_search, rowid, name)
+            values ('delete', old.id, old.name);
+        end;
+
+        insert into track_search (rowid, title, artists)
+          select t.id, t.title, coalesce((
+            select group_concat(a.name, ' ')
+            from artist_track at
+              inner join artist a on a.id = at.artist_id
+            where at.track_id = t.id), '')
+          from track t;
+
+        insert into artist_search (artist_search) values ('rebuild');""",
+        "",
+    ),
+    # 8: the database's revision increased by every sync, the snapshots
+    # of the loaded data are valid for one revision
+    """create table if not exists revision (
+        id integer primary key check (id = 1),
+        value integer not null);
+
+    insert or ignore into revision values (1, 0);""",
+    # 9: the database's unique id, the revisions of a recreated database
+    # start again from 0
+    """alter table revision add column database_id text;
+
+    update revision set database_id = lower(hex(randomblob(16)));""",
+    # 10: the users' artists and genres counters kept by the triggers, a
+    # track is counted once however many of the user's playlists have it
+    """create table if not exists user_track (
+        user_id integer,
+        track_id integer,
+        count integer not null,
+        primary key (user_id, track_id),
+        foreign key (user_id) references user(id) on delete cascade);
+
+    create table if not exists user_artist_count (
+        user_id integer,
+        artist_id integer,
+        count integer not null,
+        primary key (user_id, artist_id),
+        foreign key (user_id) references user(id) on delete cascade);
+
+    create table if not exists user_genre_count (
+        user_id integer,
+        genre text,
+        count integer not null,
+        primary key (user_id, genre),
+        foreign key (user_id) references user(id) on delete cascade);
+
+    insert into user_track
+      select user_id, track_id, count(*)
+      from playlist_track
+      group by user_id, track_id;
+
+    insert into user_artist_count
+      select ut.user_id, at.artist_id, count(*)
+      from user_track ut
+        inner join artist_track at on at.track_id = ut.track_id
+      group by ut.user_id, at.artist_id;
+
+    insert into user_genre_count
+      select ut.user_id, t.genre, count(*)
+      from user_track ut
+        inner join track t on t.id = ut.track_id
+      where t.genre is not null
+      group by ut.user_id, t.genre;
+
+    create trigger if not exists user_track_playlist_insert
+    after insert on playlist_track
+    begin
+        insert into user_track values (new.user_id, new.track_id, 1)
+        on conflict (user_id, track_id) do update set count = count + 1;
+    end;
+
+    create trigger if not exists user_track_playlist_delete
+    after delete on playlist_track
+    begin
+        update user_track set count = count - 1
+        where user_id = old.user_id and track_id = old.track_id;
+
+        delete from user_track
+        where user_id = old.user_id and track_id = old.track_id
+          and count < 1;
+    end;
+
+    create trigger if not exists user_track_insert
+    after insert on user_track
+    begin
+        insert into user_artist_count
+          select new.user_id, artist_id, 1
+          from artist_track
+          where track_id = new.track_id
+        on conflict (user_id, artist_id) do update set count = count + 1;
+
+        insert into user_genre_count
+          select new.user_id, genre, 1
+          from track
+          where id = new.track_id and genre is not null
+        on conflict (user_id, genre) do update set count = count + 1;
+    end;
+
+    create trigger if not exists user_track_delete
+    after delete on user_track
+    begin
+        update user_artist_count set count = count - 1
+        where user_id = old.user_id
+          and artist_id in (
+            select artist_id from artist_track
+            where track_id = old.track_id);
+
+        update user_genre_count set count = count - 1
+        where user_id = old.user_id
+          and genre = (select genre from track where id = old.track_id);
+
+        delete from user_artist_count
+        where user_id = old.user_id
+          and artist_id in (
+            select artist_id from artist_track
+            where track_id = old.track_id)
+          and count < 1;
+
+        delete from user_genre_count
+        where user_id = old.user_id
+          and genre = (select genre from track where id = old.track_id)
+          and count < 1;
+    end;""",
+)
+
+
+_migrated = set()
+_lock = Lock()
+
+
+def migrate(db):
+    """Apply the new migrations to the database.
+
+    Each migration is applied in its own transaction together with the
+    version number update. A read-only database has to be migrated by a
+    writer first, otherwise ReadOnlyError is raised.
+
+    :param db: DataCtx object
+    """
+    if db.path in _migrated:
+        return
+
+    with _lock:
+        version = db.select("PRAGMA user_version")[0]
+        if db.read_only and version < len(MIGRATIONS):
+            raise ReadOnlyError(db.path)
+
+        for number, scripts in enumerate(MIGRATIONS[version:], version + 1):
+            if isinstance(scripts, str):
+                scripts = (scripts,)
+
+            for script in scripts:
+                try:
+                    db.execute_script(
+                        f"""begin;
+                        {script}
+                        PRAGMA user_version = {number};
+                        commit;"""
+                    )
+                except OperationalError as e:
+                    db.execute_script("rollback;")
+                    if script is scripts[-1] \
+                            or not str(e).startswith("no such module"):
+                        raise
+                else:
+                    break
+
+        # Every in-memory database is a new one.
+        if db.path:
+            _migrated.add(db.path)
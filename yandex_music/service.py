@@ -1,7 +1,59 @@
+from contextlib import contextmanager
+from hashlib import sha1
+from json import JSONDecodeError, dumps, loads
+from tempfile import TemporaryFile
+from threading import Lock
+
+from urllib3.exceptions import HTTPError
+
+from .database import DataCtx
 from .exceptions import AccessError, NoTracksError, UserDoesNotExistError
+from .fetcher import Fetcher
 from .log import flash
 from .network import Connection
 from .query import Query
+from .stats import Stats
+
+
+class KnownIds:
+    """Ids of the tracks and artists already saved to the database.
+
+    One object is shared by the services of a batch sync, so the rows
+    saved for one user aren't built and inserted again for another one.
+    Only the ids of the committed rows are added. The ids are valid for
+    one batch only, other clients may delete the rows after it.
+
+    Attributes:
+        tracks: a set of the saved tracks' ids
+        artists: a set of the saved artists' ids
+    """
+
+    def __init__(self):
+        self.tracks = set()
+        self.artists = set()
+        self._lock = Lock()
+
+    def clear(self):
+        """Forget all the ids, e.g. after the unused rows deletion."""
+        with self._lock:
+            self.tracks = set()
+            self.artists = set()
+
+    def get_new(self, name: str, ids) -> set:
+        """Get the ids which aren't known.
+
+        :param name: "tracks" or "artists"
+        :param ids: an iterable of ids
+        :return: a set of the unknown ids
+        """
+        with self._lock:
+            return set(ids) - getattr(self, name)
+
+    def update(self, other):
+        """Add the ids of other KnownIds object."""
+        with self._lock:
+            self.tracks |= other.tracks
+            self.artists |= other.artists
 
 
 class Service:
@@ -9,73 +61,139 @@ class Service:
 
     Args:
         login: the user's login
+        connection: Connection object shared by all the requests
+        db: DataCtx object shared by all the queries
+        max_workers: the maximum number of simultaneous requests
+        batch_size: the maximum number of playlists in one request
+        batch_tracks: the maximum total tracks count of a playlists batch
+        stream_threshold: the minimum tracks count of a playlist which is
+            streamed to a temporary file instead of being kept in memory
+        chunk_size: the number of a streamed playlist's tracks saved at once
+        known: KnownIds object shared with other services of a batch
+            sync, by default every sync starts with a new one
+        stats: Stats object measuring the sync's phases
+
+    Attributes:
+        downloaded: True if the user's data has been downloaded to the
+            database on the initialization
     """
 
-    def __init__(self, login: str):
+    def __init__(self, login: str, connection: Connection = None,
+                 db: DataCtx = None, max_workers: int = 8,
+                 batch_size: int = 10, batch_tracks: int = 1000,
+                 stream_threshold: int = 5000, chunk_size: int = 500,
+                 known: KnownIds = None, stats: Stats = None):
         self._login = login
+        self._connection = connection or Connection()
+        self._fetcher = Fetcher(self._connection, max_workers)
+        self._batch_size = batch_size
+        self._batch_tracks = batch_tracks
+        self._stream_threshold = stream_threshold
+        self._chunk_size = chunk_size
+        self._shared = known
+        self._known = known or KnownIds()
+        self._saved = KnownIds()
+        self._stats = stats or Stats()
+        self.downloaded = False
         flash(msg="DB_SEARCH")
-        self._query = Query(login)
+        self._db = db or DataCtx()
+        self._query = Query(login, self._db)
 
         if not self._query.user_name:
             flash(msg="DB_FAIL")
-            self._check()
+            self._db.check_writable()
+            with self._stats.phase("check"):
+                self._check()
             flash(msg="DB_DOWNLOAD")
             self._download()
+            self.downloaded = True
 
     def update(self):
-        """Update database."""
-        common = self._common_info()
-        local_ids = self._query.get_playlists_ids()
-        remote_ids = common["playlistIds"]
-        diff = Service._get_differences(local_ids, remote_ids)
-
-        self._add_delete_playlists(common, diff, remote_ids)
+        """Update database.
+
+        All the changed playlists are downloaded first, and then the
+        database is updated in one transaction.
+        """
+        self._db.check_writable()
+        with self._stats.phase("listing"):
+            common = self._common_info()
+            local_ids = self._query.get_playlists_ids()
+            remote_ids = common["playlistIds"]
+            diff = Service._get_differences(local_ids, remote_ids)
+
+            existed_ids = set(local_ids) - (
+                diff["delete"] if diff else set()
+            )
+            existed = [
+                i for i in common["playlists"] if i["kind"] in existed_ids
+            ]
+            changed = self._get_changed(existed)
+
+        with self._stats.phase("fetch"):
+            playlists = self._get_playlists(
+                [
+                    i for i in common["playlists"]
+                    if diff and i["kind"] in diff["add"]
+                ] + changed
+            )
 
-        existed_ids = set(local_ids) - (diff["delete"] if diff else set())
-        self._update_existed(
-            [i for i in common["playlists"] if i["kind"] in existed_ids]
-        )
+        with self._stats.phase("insert"), self._transaction():
+            self._add_delete_playlists(common, diff, remote_ids, playlists)
+            self._update_existed(existed, changed, playlists)
 
-        self._query.delete_unused()
+            if self._query.delete_unused():
+                self._known.clear()
 
     def _add_artists(self, tracks, ids_to_add):
-        artists_ids = self._query.get_artists_ids()
-        artist_track_ids = self._query.get_artist_track_ids()
-        artists_params = []
-        artist_track_params = []
+        """Add the tracks' artists and links.
+
+        The known artists are skipped, the other rows already existing in
+        the database are ignored on insertion.
+        """
+        artists = {}
+        artist_track = {}
 
         for track in tracks:
             track_id = int(track["id"])
             if track_id in ids_to_add:
                 for artist in track["artists"]:
-                    artist_track = (int(artist["id"]), track_id)
+                    artist_id = int(artist["id"])
+                    artists.setdefault(artist_id, artist["name"])
+                    artist_track[(artist_id, track_id)] = None
 
-                    if artist_track[0] not in artists_ids:
-                        artists_params.append(
-                            (artist_track[0], artist["name"])
-                        )
-                        artists_ids.append(artist_track[0])
+        new_ids = self._known.get_new("artists", artists)
+        self._query.insert_artists(
+            [i for i in artists.items() if i[0] in new_ids]
+        )
+        self._query.insert_artist_track(list(artist_track))
+        self._saved.artists |= new_ids
 
-                    if artist_track not in artist_track_ids \
-                            and artist_track not in artist_track_params:
-                        artist_track_params.append(artist_track)
+    def _add_chunk(self, tracks, playlist_id, local_ids):
+        """Add the streamed tracks which aren't saved in the playlist.
 
-        self._query.insert_artists(artists_params)
-        self._query.insert_artist_track(artist_track_params)
+        The added ids are put to `local_ids`, so a track repeated in the
+        next chunks isn't added again.
+        """
+        ids_to_add = {int(i["id"]) for i in tracks} - local_ids
+        if ids_to_add:
+            self._add_tracks(tracks, playlist_id, ids_to_add)
+            local_ids |= ids_to_add
 
-    def _add_delete_playlists(self, common, diff, remote_ids):
+    def _add_delete_playlists(self, common, diff, remote_ids, playlists):
         """Add new, delete existed."""
         if diff:
             if diff["add"]:
-                self._add_new_playlists(common, diff["add"])
+                self._add_new_playlists(common, diff["add"], playlists)
             if diff["delete"]:
                 self._query.delete_playlists(diff["delete"])
 
             self._query.update_playlists_count(len(remote_ids))
 
-    def _add_new_playlists(self, common, ids):
+    def _add_new_playlists(self, common, ids, playlists):
         self._add_playlists(common, ids)
-        self._add_playlists_tracks(ids)
+        self._add_playlists_tracks(
+            {i: j for i, j in playlists.items() if i in ids}
+        )
 
     def _add_playlists(self, common, ids_to_add):
         params = [
@@ -84,7 +202,8 @@ class Service:
                 playlist["title"],
                 playlist["trackCount"],
                 0,
-                playlist.get("modified")
+                playlist.get("modified"),
+                Service._get_fingerprint(playlist)
             )
             for playlist in common["playlists"]
             if playlist["kind"] in ids_to_add
@@ -92,42 +211,74 @@ class Service:
 
         self._query.insert_playlists(params)
 
-    def _add_playlists_tracks(self, ids):
-        for _id in ids:
-            playlist = self._get_playlist(_id)
-            self._add_tracks(
-                playlist["tracks"],
-                _id,
-                set([int(str(i).split(":")[0]) for i in playlist["trackIds"]])
-            )
+    def _add_playlists_tracks(self, playlists):
+        for _id, playlist in playlists.items():
+            if not isinstance(playlist, dict):
+                self._add_streamed_tracks(_id, playlist, set())
+            else:
+                self._add_tracks(
+                    playlist["tracks"],
+                    _id,
+                    {int(str(i).split(":")[0]) for i in playlist["trackIds"]}
+                )
 
             self._query.update_playlist_duration(_id)
 
     def _add_tracks(self, tracks, playlist_id, ids_to_add):
-        tracks_ids = self._query.get_tracks_ids()
-        params = []
+        """Add the tracks to the playlist.
+
+        The known tracks are only linked to the playlist, their rows and
+        artists have been saved already.
+        """
+        new_ids = self._known.get_new("tracks", ids_to_add)
+        params = {}
 
         for track in tracks:
             track_id = int(track["id"])
 
-            if (track_id not in tracks_ids) and (track_id in ids_to_add):
-                params.append(
-                    (
-                        track_id,
-                        track["title"],
-                        track["albums"][0].get("year"),
-                        track["albums"][0].get("genre"),
-                        track["durationMs"]
-                    )
+            if (track_id in new_ids) and (track_id not in params):
+                params[track_id] = (
+                    track_id,
+                    track["title"],
+                    track["albums"][0].get("year"),
+                    track["albums"][0].get("genre"),
+                    track["durationMs"]
                 )
-                tracks_ids.append(track_id)
 
-        self._query.insert_tracks(params)
+        self._query.insert_tracks(list(params.values()))
+        self._add_artists(tracks, new_ids)
 
+        # The artists are added first for the playlists' counters.
         params = [(playlist_id, _id) for _id in ids_to_add]
         self._query.insert_playlist_tracks(params)
 
-        self._add_artists(tracks, ids_to_add)
+        self._saved.tracks |= new_ids
+
+    def _add_streamed_tracks(self, _id, file, local_ids):
+        """Add a streamed playlist's new tracks by chunks.
+
+        :param _id: the playlist's id
+        :param file: the playlist's file made by `_stream_tracks()`, it's
+          closed at the end
+        :param local_ids: a set of the playlist's saved tracks ids
+        :return: a set of the playlist's remote tracks ids
+        """
+        remote_ids = set()
+        chunk = []
+
+        with file:
+            for line in file:
+                track = loads(line)
+                remote_ids.add(int(track["id"]))
+                chunk.append(track)
+
+                if len(chunk) >= self._chunk_size:
+                    self._add_chunk(chunk, _id, local_ids)
+                    chunk = []
+
+        self._add_chunk(chunk, _id, local_ids)
+
+        return remote_ids
 
     def _add_user(self, common):
         uid = common["owner"]["uid"]
@@ -138,7 +289,7 @@ class Service:
 
     def _check(self):
         """Check a user's profile for the possibility to get his data."""
-        js = Connection().get_json("info", self._login)
+        js = self._connection.get_json("info", self._login)
 
         access = js.get("visibility")
         if not access:
@@ -151,14 +302,19 @@ class Service:
             raise NoTracksError(self._login)
 
     def _common_info(self):
-        return Connection().get_json("playlists", self._login)
+        return self._connection.get_json("playlists", self._login)
 
     def _download(self):
-        common = self._common_info()
+        with self._stats.phase("listing"):
+            common = self._common_info()
 
-        self._add_user(common)
+        with self._stats.phase("fetch"):
+            playlists = self._get_playlists(common["playlists"])
 
-        self._add_new_playlists(common, common["playlistIds"])
+        with self._stats.phase("insert"), self._transaction():
+            self._add_user(common)
+
+            self._add_new_playlists(common, common["playlistIds"], playlists)
 
     @staticmethod
     def _get_differences(local_ids, remote_ids):
@@ -171,34 +327,214 @@ class Service:
 
         return diff if diff["add"] or diff["delete"] else None
 
-    def _get_playlist(self, _id):
-        return Connection().get_json(
-            "playlist", self._login, _id
-        )["playlist"]
+    def _get_batches(self, listing):
+        """Split the playlists into batches of kinds for requests.
+
+        :param listing: a list of the playlists' short info
+        :return: a list of kinds lists
+        """
+        batches = [[]]
+        tracks = 0
+
+        for playlist in listing:
+            count = playlist.get("trackCount", 0)
+            if batches[-1] and (
+                len(batches[-1]) >= self._batch_size
+                or tracks + count > self._batch_tracks
+            ):
+                batches.append([])
+                tracks = 0
+
+            batches[-1].append(playlist["kind"])
+            tracks += count
+
+        return batches if batches[0] else []
+
+    def _get_batch(self, kinds):
+        """Download a batch of playlists.
+
+        If the request fails or doesn't return all the playlists,
+        the missing ones are split in halves and requested again.
+
+        :param kinds: a list of the playlists' kinds
+        :return: a dict with {kind: playlist} items
+        """
+        try:
+            js = self._connection.get_json(
+                "playlist", self._login, ",".join(map(str, kinds))
+            )
+            playlists = Service._split_playlists(js, kinds)
+        except (HTTPError, JSONDecodeError, KeyError, TypeError):
+            if len(kinds) == 1:
+                raise
+            playlists = {}
+
+        missing = [i for i in kinds if i not in playlists]
+        if len(kinds) > 1 and missing:
+            middle = (len(missing) + 1) // 2
+            playlists.update(self._get_batch(missing[:middle]))
+            if missing[middle:]:
+                playlists.update(self._get_batch(missing[middle:]))
+
+        return playlists
+
+    def _get_changed(self, existed):
+        """Get the existed playlists which have to be downloaded again.
+
+        A playlist is downloaded if its fingerprint from the listing
+        differs from the stored one or can't be made.
+        """
+        fingerprints = self._query.get_fingerprints()
+
+        changed = []
+        for playlist in existed:
+            fingerprint = Service._get_fingerprint(playlist)
+            if not fingerprint \
+                    or fingerprints.get(playlist["kind"]) != fingerprint:
+                changed.append(playlist)
+
+        return changed
+
+    @staticmethod
+    def _get_fingerprint(playlist):
+        """Get a playlist's fingerprint from its short info.
+
+        The fingerprint is made of the revision, the modified datetime and
+        the tracks ids, the tracks count is added to them. If there is
+        none of the first three fields, a change can't be detected and
+        None is returned.
+        """
+        fields = [
+            playlist.get("revision"),
+            playlist.get("modified"),
+        ]
+        if playlist.get("trackIds") is not None:
+            fields.append(
+                sha1(
+                    ",".join(map(str, playlist["trackIds"])).encode()
+                ).hexdigest()
+            )
+
+        if all(i is None for i in fields):
+            return None
+
+        return ":".join(
+            "" if i is None else str(i)
+            for i in [*fields, playlist.get("trackCount")]
+        )
+
+    def _get_playlists(self, listing):
+        """Download the playlists concurrently by batches.
+
+        The large playlists are streamed to temporary files by
+        `_stream_tracks()` concurrently with the batches, and the files
+        are their values.
+
+        :param listing: a list of the playlists' short info
+        :return: a dict with {kind: playlist or file} items in the
+          listing order
+        """
+        large = [
+            i["kind"] for i in listing
+            if i.get("trackCount", 0) >= self._stream_threshold
+        ]
+        playlists = dict(
+            zip(large, self._fetcher.run_many(self._stream_tracks, large))
+        )
+        for batch in self._fetcher.run_many(
+            self._get_batch,
+            self._get_batches(
+                [i for i in listing if i["kind"] not in playlists]
+            )
+        ):
+            playlists.update(batch)
 
-    def _update_existed(self, existed):
+        return {
+            i["kind"]: playlists[i["kind"]] for i in listing
+            if i["kind"] in playlists
+        }
+
+    @staticmethod
+    def _split_playlists(js, kinds):
+        """Get a dict with {kind: playlist} items from a response."""
+        if "playlists" in js:
+            return {i["kind"]: i for i in js["playlists"]}
+
+        return {kinds[0]: js["playlist"]} if len(kinds) == 1 else {}
+
+    def _stream_tracks(self, _id):
+        """Download a playlist's tracks to a temporary file.
+
+        The tracks are decoded from the response one by one and written
+        by lines, so the whole playlist is never kept in memory. The file
+        is read by `_add_streamed_tracks()` in the sync's transaction,
+        and no request is made while the database is locked.
+
+        :param _id: the playlist's id
+        :return: the file object at the beginning, deleted on closing
+        """
+        file = TemporaryFile("w+", encoding="utf-8")
+        for track in self._connection.iter_json(
+            "playlist", self._login, _id, key="tracks"
+        ):
+            file.write(f"{dumps(track, ensure_ascii=False)}\n")
+
+        file.seek(0)
+        return file
+
+    @contextmanager
+    def _transaction(self):
+        """Run a sync in one transaction.
+
+        The ids of the saved tracks and artists become known only if the
+        block succeeds, other threads can't use them before the commit.
+        The ids of a not shared KnownIds are forgotten before, the rows
+        may have been deleted by another client since the last sync.
+        The database's revision is increased, so the snapshots of the
+        loaded data become stale.
+        """
+        if not self._shared:
+            self._known = KnownIds()
+        self._saved = KnownIds()
+        with self._query.transaction():
+            yield
+            self._query.update_revision()
+            self._known.update(self._saved)
+
+    def _update_existed(self, existed, changed, playlists):
         for playlist in existed:
             _id = playlist["kind"]
             new_title = playlist["title"]
-            new_modified = playlist.get("modified")
 
             if self._query.get_playlist_title(_id) != new_title:
                 self._query.update_playlist_title(_id, new_title)
 
-            if not new_modified:
-                self._update_playlist(_id)
-            elif self._query.get_modified(_id) != new_modified:
-                self._update_playlist(_id)
+        for playlist in changed:
+            _id = playlist["kind"]
+            self._update_playlist(_id, playlists[_id])
+
+            new_modified = playlist.get("modified")
+            if new_modified:
                 self._query.update_modified(_id, new_modified)
 
-    def _update_playlist(self, _id):
-        playlist = self._get_playlist(_id)
+            self._query.update_fingerprint(
+                _id, Service._get_fingerprint(playlist)
+            )
+
+    def _update_playlist(self, _id, playlist):
         local_ids = self._query.get_playlist_tracks_ids(_id)
-        remote_ids = [int(str(i).split(":")[0]) for i in playlist["trackIds"]]
+        if not isinstance(playlist, dict):
+            remote_ids = self._add_streamed_tracks(
+                _id, playlist, set(local_ids)
+            )
+        else:
+            remote_ids = [
+                int(str(i).split(":")[0]) for i in playlist["trackIds"]
+            ]
 
         diff = Service._get_differences(local_ids, remote_ids)
         if diff:
-            if diff["add"]:
+            if diff["add"] and isinstance(playlist, dict):
                 self._add_tracks(playlist["tracks"], _id, diff["add"])
             if diff["delete"]:
                 self._query.delete_tracks(_id, diff["delete"])
@@ -0,0 +1,73 @@
+import marshal
+import os
+from threading import get_ident
+
+# The version of the snapshots' data layout, the snapshots of the other
+# versions are ignored.
+FORMAT = 1
+
+
+class Snapshot:
+    """A binary snapshot of a user's loaded data.
+
+    The rows selected for the models are stored by marshal together with
+    the database's revision, so a new client can read them at once
+    instead of selecting them again. A snapshot is valid only for the
+    revision it's been saved with, the revision includes the database's
+    unique id, so a recreated database doesn't match the old snapshots.
+
+    Args:
+        path: a path to the snapshot's file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def delete(self):
+        """Delete the snapshot's file if it exists."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def load(self, revision: tuple):
+        """Read the data saved with the revision.
+
+        :param revision: the database's current revision, see
+          Query.get_revision()
+        :return: the saved data or None if the snapshot is missing,
+          broken or stale
+        """
+        try:
+            with open(self.path, "rb") as file:
+                version, saved, data = marshal.loads(file.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        if version != FORMAT or saved != revision:
+            return None
+
+        return data
+
+    def save(self, revision: tuple, data):
+        """Write the data with the revision.
+
+        The file is replaced at once, so the readers never see a partly
+        written snapshot. A failed write is ignored, the data will be
+        selected from the database next time.
+
+        :param revision: the database's revision read before the data
+        :param data: the data of the marshal's supported types
+        """
+        temp = f"{self.path}.{os.getpid()}.{get_ident()}"
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp, "wb") as file:
+                file.write(marshal.dumps((FORMAT, revision, data)))
+            os.replace(temp, self.path)
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+
+
+class Stats:
+    """Counters and timings of a client's work.
+
+    The phases of a sync, the HTTP requests and the SQL statements are
+    summed up here, and every event is passed to the callback if it's
+    given. The callback is called with the event's name ("phase",
+    "request" or "statement") and the event's data as keyword arguments,
+    from the thread which has done the work.
+
+    Args:
+        callback: a function called on every event
+
+    Attributes:
+        phases: a dict with {phase: total seconds} items
+        requests: the number of HTTP requests
+        received: the number of received bytes
+        requests_time: the total requests latency in seconds
+        statements: the number of SQL statements
+        statements_time: the total statements duration in seconds
+    """
+
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._lock = Lock()
+        self.reset()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Measure the time of the block as a phase.
+
+        :param name: the phase's name, e.g. "listing"
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            self._emit("phase", name=name, elapsed=elapsed)
+
+    def add_request(self, url: str, status: int, size: int,
+                    elapsed: float):
+        """Count an HTTP request.
+
+        :param url: the request's URL
+        :param status: the response's status
+        :param size: the number of the response's received bytes
+        :param elapsed: the time until the response's headers in seconds
+        """
+        with self._lock:
+            self.requests += 1
+            self.received += size
+            self.requests_time += elapsed
+        self._emit(
+            "request", url=url, status=status, size=size, elapsed=elapsed
+        )
+
+    def add_statement(self, statement: str, elapsed: float):
+        """Count an SQL statement.
+
+        :param statement: the statement's SQL
+        :param elapsed: the statement's duration in seconds
+        """
+        with self._lock:
+            self.statements += 1
+            self.statements_time += elapsed
+        self._emit("statement", statement=statement, elapsed=elapsed)
+
+    def as_dict(self) -> dict:
+        """Get all the counters and timings."""
+        with self._lock:
+            return {
+                "phases": dict(self.phases),
+                "requests": self.requests,
+                "received": self.received,
+                "requests_time": self.requests_time,
+                "statements": self.statements,
+                "statements_time": self.statements_time,
+            }
+
+    def reset(self):
+        """Set all the counters and timings to zero."""
+        with self._lock:
+            self.phases = {}
+            self.requests = 0
+            self.received = 0
+            self.requests_time = 0.0
+            self.statements = 0
+            self.statements_time = 0.0
+
+    def _emit(self, event, **data):
+        if self._callback:
+            self._callback(event, **data)
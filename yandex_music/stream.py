@@ -0,0 +1,88 @@
+import re
+from codecs import getincrementaldecoder
+from json import JSONDecodeError, JSONDecoder
+
+_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"', re.DOTALL)
+_OPENING = re.compile(r"\s*:\s*\[")
+_OPENING_START = re.compile(r"\s*(:\s*)?\Z")
+_WHITESPACE = re.compile(r"[\s,]*")
+_DELIMITER = re.compile(r"\s*[,\]]")
+_decoder = JSONDecoder()
+
+
+def iter_array(chunks, key: str):
+    """Decode items of a JSON array from a stream of chunks one by one.
+
+    The array is the value of the first object member named `key` at any
+    depth, the rest of the document is skipped. Only the current item and
+    the undecoded part of the current chunk are kept in memory.
+
+    The document has to contain the whole array, so the items yielded
+    before an error are never taken for all the array's items.
+
+    :param chunks: an iterable of bytes chunks of a JSON document
+    :param key: the array member's name
+    :return: a generator of the array's decoded items
+    :raise ValueError: if the array isn't found, isn't closed or has
+      a malformed item
+    """
+    text = getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    ended = False
+
+    def read(buffer, pos):
+        """Drop the processed text and read the next chunk."""
+        chunk = next(chunks, None)
+        if chunk is None:
+            return buffer[pos:] + text.decode(b"", final=True), 0, True
+        return buffer[pos:] + text.decode(chunk), 0, False
+
+    # Find the member's name followed by a colon and an opening bracket.
+    while True:
+        start = buffer.find('"', pos)
+        match = _STRING.match(buffer, start) if start != -1 else None
+
+        if match:
+            opening = _OPENING.match(buffer, match.end())
+            if match[1] == key and opening:
+                pos = opening.end()
+                break
+
+            if match[1] != key \
+                    or not _OPENING_START.match(buffer, match.end()):
+                pos = match.end()
+                continue
+
+        if ended:
+            raise ValueError(f"The '{key}' array isn't found.")
+
+        buffer, pos, ended = read(
+            buffer, start if start != -1 else len(buffer)
+        )
+
+    # Decode the items until the closing bracket.
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+
+        if pos < len(buffer):
+            if buffer[pos] == "]":
+                return
+
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except JSONDecodeError:
+                end = None
+
+            # An item is complete only if a delimiter follows it, e.g. a
+            # number at the buffer's end may go on in the next chunk.
+            if end is not None and _DELIMITER.match(buffer, end):
+                yield item
+                pos = end
+                continue
+
+        if ended:
+            raise ValueError(f"The '{key}' array is truncated or malformed.")
+
+        buffer, pos, ended = read(buffer, pos)